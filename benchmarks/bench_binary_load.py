@@ -0,0 +1,131 @@
+import contextlib
+import getopt
+import io
+import json
+import os.path
+import sys
+import tempfile
+
+import gen_corpus
+
+# makes modules of repository importable
+import common
+
+import wpd
+import wpd_binary
+
+
+# compares startup cost of tools, which load wpd.py output: json target
+# with json.load() against binary target with wpd_binary.load_binary().
+# binary is measured for opening only, for lookup of one interface (typical
+# tool startup) and for walking whole model into the same struct, as json
+# has
+#
+# usage: python3 benchmarks/bench_binary_load.py [options] [corpus_dir]
+#
+# corpus_dir is described in common.py
+
+
+def load_json(filename):
+    with open(filename) as f:
+        return json.load(f)
+
+
+def binary_lookup(filename, name):
+    with wpd_binary.load_binary(filename) as model:
+        return model.find_interface(name).simple_struct()
+
+
+def binary_walk(filename):
+    with wpd_binary.load_binary(filename) as model:
+        return model.simple_struct()
+
+
+def run(corpus, directory, rounds):
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        pc = wpd.generate_ProtocolCollection_for_files(
+            corpus,
+            wpd.find_all_xml_files(corpus)
+        )
+        pc.sort_protocol_files()
+
+    json_filename = os.path.join(directory, 'wayland-protocols.json')
+    with open(json_filename, 'w') as f:
+        f.write(wpd.generate_json(wpd.generate_simple_struct(pc)))
+
+    binary_filename = os.path.join(directory, 'wayland-protocols.bin')
+    with open(binary_filename, 'wb') as f:
+        wpd.generate_binary_stream(pc, f)
+
+    # interface in the middle of the file
+    name = pc.protocol_files[len(pc.protocol_files) // 2] \
+        .protocols[0].interfaces[0].name
+
+    json_time, struct = common.best_of(
+        lambda: load_json(json_filename), rounds)
+    open_time, model = common.best_of(
+        lambda: wpd_binary.load_binary(binary_filename), rounds)
+    model.close()
+    lookup_time, interface = common.best_of(
+        lambda: binary_lookup(binary_filename, name), rounds)
+    walk_time, walked = common.best_of(
+        lambda: binary_walk(binary_filename), rounds)
+
+    if walked != struct:
+        raise RuntimeError("binary model differs from json")
+
+    print("protocol files: {}, best of {} rounds".format(
+        len(pc.protocol_files), rounds))
+    print("json size:          {:10} bytes".format(
+        os.path.getsize(json_filename)))
+    print("binary size:        {:10} bytes".format(
+        os.path.getsize(binary_filename)))
+    print("json.load:          {:.6f}s".format(json_time))
+    print("binary open:        {:.6f}s".format(open_time))
+    print("binary lookup {!r}: {:.6f}s".format(name, lookup_time))
+    print("binary whole walk:  {:.6f}s".format(walk_time))
+    if lookup_time > 0:
+        print("json.load / binary lookup: {:.1f}x".format(
+            json_time / lookup_time))
+
+
+def print_help():
+    print(
+        """
+{cmd} [options] [corpus_dir]
+
+  -r  N           - rounds of each measurement. default is 5
+
+  synthetic corpus settings (used if corpus_dir is not given):
+  {settings}
+""".format(cmd=sys.argv[0], settings=common.SYNTHETIC_HELP))
+
+
+def main():
+
+    opts, args = getopt.getopt(
+        sys.argv[1:],
+        'r:h',
+        ['help'] + common.SYNTHETIC_OPTIONS
+    )
+
+    rounds = 5
+    for i in opts:
+        if i[0] == '-r':
+            rounds = int(i[1])
+        if i[0] in ['-h', '--help']:
+            print_help()
+            return
+
+    settings = gen_corpus.parse_settings(opts)
+
+    with tempfile.TemporaryDirectory() as directory, \
+            common.synthetic_corpus(args, settings) as corpus:
+
+        print("corpus: {}".format(corpus))
+        run(corpus, directory, rounds)
+
+
+if __name__ == '__main__':
+    main()
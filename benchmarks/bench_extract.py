@@ -0,0 +1,146 @@
+import contextlib
+import io
+import os.path
+import sys
+
+# makes modules of repository importable
+import common
+
+import wpd
+
+
+# compares single pass tree extraction (wpd.generate_ProtocolFile_for_parsed)
+# against previous xpath() based implementation, kept below as reference.
+# both must produce same tree.
+#
+# usage: python3 benchmarks/bench_extract.py [corpus_dir [rounds]]
+#
+# corpus_dir is described in common.py
+
+
+def xpath_apply_common_fields(obj, element):
+
+    obj.name = wpd.SYMBOLS.intern(element.get('name', ''))
+
+    for descr in element.xpath('description'):
+        t = descr.text
+        if t is None:
+            t = ""
+        d = wpd.Description()
+        d.text = t.strip()
+        d.summary = descr.get('summary', '').strip()
+        obj.descriptions.append(d)
+
+    for copy in element.xpath('copyright'):
+        t = copy.text
+        if t is None:
+            t = ""
+        d = wpd.Copyright()
+        d.text = t.strip()
+        d.name = ''
+        obj.copyrights.append(d)
+
+
+def xpath_apply_args(obj, element):
+    for arg in element.xpath('arg'):
+        arg_o = wpd.Argument()
+        arg_o.name = wpd.SYMBOLS.intern(arg.get('name', ''))
+        arg_o.type_ = wpd.SYMBOLS.intern(arg.get('type', ''))
+        arg_o.interface = wpd.SYMBOLS.intern(arg.get('interface', ''))
+        arg_o.summary = arg.get('summary', '')
+        obj.arguments.append(arg_o)
+
+
+def xpath_ProtocolFile_for_parsed(parsed_info):
+
+    protocol_file = wpd.ProtocolFile()
+    protocol_file.basename = parsed_info['basename']
+    protocol_file.dirname = parsed_info['dirname']
+
+    protocols = parsed_info['parsed'].xpath('/protocol')
+
+    if len(protocols) == 0:
+        return None
+
+    for protocol in protocols:
+        prot_o = wpd.Protocol()
+        xpath_apply_common_fields(prot_o, protocol)
+
+        for interface in protocol.xpath('interface'):
+            interf_o = wpd.Interface()
+            xpath_apply_common_fields(interf_o, interface)
+            interf_o.version = wpd.SYMBOLS.intern(
+                interface.get('version', '0'))
+
+            for request in interface.xpath('request'):
+                request_o = wpd.Request()
+                xpath_apply_common_fields(request_o, request)
+                xpath_apply_args(request_o, request)
+                interf_o.requests.append(request_o)
+
+            for event in interface.xpath('event'):
+                event_o = wpd.Event()
+                xpath_apply_common_fields(event_o, event)
+                xpath_apply_args(event_o, event)
+                interf_o.events.append(event_o)
+
+            for enum in interface.xpath('enum'):
+                enum_o = wpd.Enum()
+                xpath_apply_common_fields(enum_o, enum)
+                for entry in enum.xpath('entry'):
+                    entry_o = wpd.Entry()
+                    entry_o.name = wpd.SYMBOLS.intern(entry.get('name', ''))
+                    entry_o.value = wpd.SYMBOLS.intern(entry.get('value', ''))
+                    entry_o.summary = entry.get('summary', '')
+                    enum_o.entries.append(entry_o)
+                interf_o.enums.append(enum_o)
+
+            prot_o.interfaces.append(interf_o)
+
+        protocol_file.protocols.append(prot_o)
+
+    return protocol_file
+
+
+def run(func, parsed_docs, rounds):
+    return common.best_of(
+        lambda: [func(parsed_docs[k]) for k in parsed_docs], rounds)
+
+
+def main():
+
+    corpus = common.repo_corpus(sys.argv[1:2])
+
+    rounds = 5
+    if len(sys.argv) > 2:
+        rounds = int(sys.argv[2])
+
+    parsed_docs = dict()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in wpd.find_all_xml_files(corpus):
+            k, v = wpd.parse_xml(os.path.join(corpus, i))
+            if k is not None:
+                parsed_docs[k] = v
+
+    xpath_time, xpath_res = run(
+        xpath_ProtocolFile_for_parsed, parsed_docs, rounds)
+    single_time, single_res = run(
+        wpd.generate_ProtocolFile_for_parsed, parsed_docs, rounds)
+
+    for a, b in zip(xpath_res, single_res):
+        if (wpd.protocol_file_simple_struct(a)
+                != wpd.protocol_file_simple_struct(b)):
+            raise RuntimeError(
+                "trees differ: {}/{}".format(a.dirname, a.basename))
+
+    print("corpus: {}".format(corpus))
+    print("protocol files: {}, best of {} rounds".format(
+        len(parsed_docs), rounds))
+    print("xpath():     {:.4f}s".format(xpath_time))
+    print("single pass: {:.4f}s".format(single_time))
+    if single_time > 0:
+        print("speedup: {:.2f}x".format(xpath_time / single_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+import contextlib
+import io
+import sys
+import time
+import tracemalloc
+
+# makes modules of repository importable
+import common
+
+import wpd
+
+
+# compares memory taken by the ProtocolCollection tree with slotted model
+# classes (as used by wpd.py) against the same tree made of plain classes
+# with per-instance __dict__.
+#
+# usage: python3 benchmarks/bench_model_memory.py [corpus_dir]
+#
+# corpus_dir is described in common.py
+
+MODEL_CLASSES = [
+    wpd.ProtocolFile,
+    wpd.Protocol,
+    wpd.Interface,
+    wpd.Request,
+    wpd.Event,
+    wpd.Argument,
+    wpd.Enum,
+    wpd.Entry,
+    wpd.Description,
+    wpd.Copyright,
+]
+
+
+def slot_names(cls):
+    ret = []
+    for i in reversed(cls.__mro__):
+        for j in i.__dict__.get('__slots__', ()):
+            ret.append(j)
+    return ret
+
+
+def make_dict_classes():
+    ret = dict()
+    for i in MODEL_CLASSES:
+        ret[i] = type(i.__name__ + 'WithDict', (), {})
+    return ret
+
+
+def clone(obj, class_map, counts):
+
+    # strings are shared with the source tree, so only objects and lists
+    # are allocated by the copy
+
+    if isinstance(obj, list):
+        return [clone(i, class_map, counts) for i in obj]
+
+    t = type(obj)
+    if t in class_map:
+        counts[t.__name__] = counts.get(t.__name__, 0) + 1
+        ret = class_map[t].__new__(class_map[t])
+        for i in slot_names(t):
+            setattr(ret, i, clone(getattr(obj, i), class_map, counts))
+        return ret
+
+    return obj
+
+
+def measure_clone(protocol_files, class_map):
+    counts = dict()
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    t0 = time.perf_counter()
+    copy = clone(protocol_files, class_map, counts)
+    t1 = time.perf_counter()
+    after = tracemalloc.get_traced_memory()[0]
+    del copy
+    return after - before, t1 - t0, counts
+
+
+def main():
+
+    corpus = common.repo_corpus(sys.argv[1:2])
+
+    xml_files = wpd.find_all_xml_files(corpus)
+
+    tracemalloc.start()
+
+    before = tracemalloc.get_traced_memory()[0]
+    with contextlib.redirect_stdout(io.StringIO()):
+        obj_tree = wpd.generate_ProtocolCollection_for_files(
+            corpus,
+            xml_files
+        )
+    model_size = tracemalloc.get_traced_memory()[0] - before
+
+    slotted_map = dict([(i, i) for i in MODEL_CLASSES])
+    dict_map = make_dict_classes()
+
+    slotted_size, slotted_time, counts = measure_clone(
+        obj_tree.protocol_files,
+        slotted_map
+    )
+    dict_size, dict_time, _ = measure_clone(
+        obj_tree.protocol_files,
+        dict_map
+    )
+
+    tracemalloc.stop()
+
+    print("corpus: {}".format(corpus))
+    print("protocol files: {}".format(len(obj_tree.protocol_files)))
+    print("objects:")
+    for i in sorted(counts):
+        print("  {:<12} {}".format(i, counts[i]))
+    print("whole model (with strings): {} bytes".format(model_size))
+    print("object structure with __slots__: {} bytes ({:.3f}s)".format(
+        slotted_size, slotted_time))
+    print("object structure with __dict__:  {} bytes ({:.3f}s)".format(
+        dict_size, dict_time))
+    if dict_size > 0:
+        print("saved: {} bytes ({:.1f}%)".format(
+            dict_size - slotted_size,
+            100.0 * (dict_size - slotted_size) / dict_size
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+import contextlib
+import io
+import json
+import sys
+
+# makes modules of repository importable
+import common
+
+import wpd
+import wpd_search
+
+
+# measures cost of search index (wpd.generate_search_index) relative to
+# html generation, size of index against size of html, and query time of
+# wpd_search.SearchIndex
+#
+# usage: python3 benchmarks/bench_search_index.py [corpus_dir [rounds]]
+#
+# corpus_dir is described in common.py
+
+QUERIES = [
+    'wl_surface',
+    'surface',
+    'buf',
+    'surface attach',
+    'destroy object',
+    'xdg_toplevel.set_title',
+]
+
+
+def main():
+
+    corpus = common.repo_corpus(sys.argv[1:2])
+
+    rounds = 5
+    if len(sys.argv) > 2:
+        rounds = int(sys.argv[2])
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        pc = wpd.generate_ProtocolCollection_for_files(
+            corpus,
+            wpd.find_all_xml_files(corpus)
+        )
+        pc.sort_protocol_files()
+
+    html_time, html = common.best_of(lambda: wpd.generate_html(pc), rounds)
+    index_time, struct = common.best_of(
+        lambda: wpd.generate_search_index(pc), rounds)
+
+    index_txt = json.dumps(struct, separators=(',', ':'))
+
+    load_time, index = common.best_of(
+        lambda: wpd_search.SearchIndex(json.loads(index_txt)), rounds)
+
+    print("corpus: {}".format(corpus))
+    print("protocol files: {}, best of {} rounds".format(
+        len(pc.protocol_files), rounds))
+    print("html:         {:.4f}s, {} bytes".format(
+        html_time, len(html)))
+    print("search index: {:.4f}s, {} bytes, {} entries".format(
+        index_time, len(index_txt), len(struct['docs'])))
+    if html_time > 0:
+        print("index / html time: {:.1f}%".format(
+            100 * index_time / html_time))
+    print("index load:   {:.4f}s".format(load_time))
+
+    for query in QUERIES:
+        for prefix in [False, True]:
+            t, res = common.best_of(
+                lambda: index.search(query, 20, prefix), rounds)
+            print("query {!r:28} {:6}: {:.6f}s, {} results".format(
+                query, 'prefix' if prefix else 'exact', t, len(res)))
+
+
+if __name__ == '__main__':
+    main()
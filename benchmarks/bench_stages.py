@@ -0,0 +1,241 @@
+import contextlib
+import getopt
+import io
+import json
+import os.path
+import platform
+import subprocess
+import sys
+import tempfile
+
+import gen_corpus
+
+# makes modules of repository importable
+import common
+
+import wpd
+
+
+# times each stage of wpd.py separately: scanning, parsing, tree generation,
+# sorting and every output target. results are saved as json, so runs on
+# different commits can be compared with --compare.
+#
+# usage: python3 benchmarks/bench_stages.py [options] [corpus_dir]
+#
+# corpus_dir is described in common.py
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(wpd.__file__)),
+            capture_output=True,
+            text=True,
+            check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_stages(corpus, rounds):
+
+    # returns list of [stage name, times]. each stage takes result of
+    # previous ones, so they run in order
+
+    ret = []
+
+    def stage(name, func):
+        with contextlib.redirect_stdout(io.StringIO()):
+            times, res = common.round_times(func, rounds)
+        ret.append([name, times])
+        return res
+
+    xml_files = stage(
+        'find_all_xml_files',
+        lambda: wpd.find_all_xml_files(corpus)
+    )
+
+    def parse_all():
+        parsed_docs = dict()
+        for i in xml_files:
+            k, v = wpd.parse_xml(os.path.join(corpus, i))
+            if k is not None:
+                parsed_docs[k] = v
+        return parsed_docs
+
+    parsed_docs = stage('parse_xml', parse_all)
+
+    pc = stage(
+        'generate_ProtocolCollection',
+        lambda: wpd.generate_ProtocolCollection(parsed_docs)
+    )
+
+    # sorting of already sorted list is faster, so every round sorts copy
+    # of list in original order
+
+    unsorted = list(pc.protocol_files)
+
+    def sort():
+        pc.protocol_files = list(unsorted)
+        pc.sort_protocol_files()
+
+    stage('sort_protocol_files', sort)
+
+    stage('build_index', pc.build_index)
+    stage('cross-reference', lambda: wpd.generate_InterfaceGraph(pc))
+
+    pc.get_xref()
+
+    stage(
+        'yaml',
+        lambda: wpd.generate_yaml(wpd.generate_simple_struct(pc))
+    )
+    stage('yaml --stream', lambda: wpd.generate_yaml_stream(pc, io.StringIO()))
+    stage(
+        'yaml-documents',
+        lambda: wpd.generate_yaml_documents_stream(pc, io.StringIO())
+    )
+
+    # libyaml emitter is measured only if pyyaml is built with it
+    if wpd.set_yaml_dumper(True) is not wpd.yaml.Dumper:
+        stage(
+            'yaml --fast-yaml',
+            lambda: wpd.generate_yaml(wpd.generate_simple_struct(pc))
+        )
+        stage(
+            'yaml --fast-yaml --stream',
+            lambda: wpd.generate_yaml_stream(pc, io.StringIO())
+        )
+    wpd.set_yaml_dumper(False)
+
+    stage(
+        'json',
+        lambda: wpd.generate_json(wpd.generate_simple_struct(pc))
+    )
+    stage('json --stream', lambda: wpd.generate_json_stream(pc, io.StringIO()))
+    stage('html', lambda: wpd.generate_html(pc))
+    stage('html --stream', lambda: wpd.generate_html_stream(pc, io.BytesIO()))
+
+    with tempfile.TemporaryDirectory() as d:
+        stage('html-sharded', lambda: wpd.generate_html_sharded(pc, d))
+
+    stage('search index', lambda: wpd.generate_search_index(pc))
+    stage('binary', lambda: wpd.generate_binary_stream(pc, io.BytesIO()))
+
+    # sqlite database is written into new file each round
+    with tempfile.TemporaryDirectory() as d:
+        files = []
+
+        def sqlite():
+            files.append(os.path.join(d, '{}.sqlite'.format(len(files))))
+            return wpd.generate_sqlite(pc, files[-1])
+
+        stage('sqlite', sqlite)
+    stage('c++', lambda: wpd.generate_cpp_code(pc))
+
+    return ret
+
+
+def corpus_info(corpus):
+    files = wpd.find_all_xml_files(corpus)
+    size = 0
+    for i in files:
+        size += os.path.getsize(os.path.join(corpus, i))
+    return {'files': len(files), 'bytes': size}
+
+
+def print_help():
+    print(
+        """
+{cmd} [options] [corpus_dir]
+
+  -r  N           - rounds of each stage. default is 5
+  -o  filename    - save results as json
+  --compare filename
+                  - compare results with previously saved ones
+
+  synthetic corpus settings (used if corpus_dir is not given):
+  {settings}
+""".format(cmd=sys.argv[0], settings=common.SYNTHETIC_HELP))
+
+
+def main():
+
+    opts, args = getopt.getopt(
+        sys.argv[1:],
+        'r:o:h',
+        ['help', 'compare='] + common.SYNTHETIC_OPTIONS
+    )
+
+    rounds = 5
+    output = ''
+    compare = ''
+    for i in opts:
+        if i[0] == '-r':
+            rounds = int(i[1])
+        if i[0] == '-o':
+            output = i[1]
+        if i[0] == '--compare':
+            compare = i[1]
+        if i[0] in ['-h', '--help']:
+            print_help()
+            return
+
+    # settings are saved with results of synthetic corpus only
+    if len(args) != 0:
+        settings = None
+    else:
+        settings = dict(gen_corpus.DEFAULTS)
+        settings.update(gen_corpus.parse_settings(opts))
+
+    with common.synthetic_corpus(args, settings) as corpus:
+        info = corpus_info(corpus)
+        stages = run_stages(corpus, rounds)
+
+    results = {
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'corpus': corpus if settings is None else None,
+        'settings': settings,
+        'files': info['files'],
+        'bytes': info['bytes'],
+        'rounds': rounds,
+        'stages': dict(),
+    }
+
+    for name, times in stages:
+        results['stages'][name] = {
+            'best': min(times),
+            'mean': sum(times) / len(times),
+            'times': times,
+        }
+
+    old = None
+    if compare != '':
+        with open(compare) as f:
+            old = json.load(f)
+        print("compared with {} (revision {})".format(
+            compare, old.get('revision')))
+
+    print("{} files, {} bytes, best of {} rounds".format(
+        info['files'], info['bytes'], rounds))
+
+    for name, times in stages:
+        line = "{:30} {:9.4f}s".format(name, min(times))
+        if old is not None and name in old['stages']:
+            old_best = old['stages'][name]['best']
+            if old_best > 0:
+                line += "  {:9.4f}s  {:+6.1f}%".format(
+                    old_best, 100 * (min(times) - old_best) / old_best)
+        print(line)
+
+    if output != '':
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=4)
+        print("saved {}".format(output))
+
+
+if __name__ == '__main__':
+    main()
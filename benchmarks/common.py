@@ -0,0 +1,63 @@
+import contextlib
+import os.path
+import sys
+import tempfile
+import time
+
+import gen_corpus
+
+
+# shared parts of benchmarks. importing this module makes wpd.py and other
+# modules of repository importable.
+#
+# benchmarks take corpus_dir argument: directory with xml files, searched
+# the same way as wpd.py does. without it bench_stages.py and
+# bench_binary_load.py generate synthetic corpus into temporary directory
+# (see gen_corpus.py for its settings), others use repository root (wayland
+# and protocols submodules)
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, REPO_DIR)
+
+
+def round_times(func, rounds):
+    # returns list of times of all rounds and result of the last one
+    times = []
+    ret = None
+    for i in range(rounds):
+        t0 = time.perf_counter()
+        ret = func()
+        times.append(time.perf_counter() - t0)
+    return times, ret
+
+
+def best_of(func, rounds):
+    # returns time of the fastest round and result of the last one
+    times, ret = round_times(func, rounds)
+    return min(times), ret
+
+
+def repo_corpus(args):
+    # corpus_dir from positional arguments, repository root if not given
+    if len(args) != 0:
+        return os.path.abspath(args[0])
+    return REPO_DIR
+
+
+@contextlib.contextmanager
+def synthetic_corpus(args, settings=None):
+    # yields corpus_dir from positional arguments or, if it's not given,
+    # directory with synthetic corpus, made with gen_corpus settings
+    if len(args) != 0:
+        yield os.path.abspath(args[0])
+        return
+    with tempfile.TemporaryDirectory() as directory:
+        gen_corpus.generate_corpus(directory, settings)
+        yield directory
+
+
+# getopt long options and help line for gen_corpus settings
+SYNTHETIC_OPTIONS = [i + '=' for i in gen_corpus.DEFAULTS]
+
+SYNTHETIC_HELP = ', '.join('--{} N'.format(i) for i in gen_corpus.DEFAULTS)
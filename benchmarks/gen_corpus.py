@@ -0,0 +1,222 @@
+import getopt
+import os.path
+import random
+import sys
+
+import lxml.etree
+
+from lxml.builder import E as LBE
+
+
+# generates synthetic, valid wayland protocol xml files for benchmarks.
+# layout is the same, as in repository: wayland/protocol/wayland.xml and
+# protocols/{stable,staging,unstable}/<name>/<name>-v1.xml, so wpd.py can be
+# copied into output directory and run there.
+#
+# usage: python3 benchmarks/gen_corpus.py [options] output_dir
+#
+# same options and seed give same files
+
+DEFAULTS = {
+    'files': 50,
+    'interfaces': 4,
+    'messages': 6,
+    'args': 4,
+    'enums': 2,
+    'entries': 5,
+    'description': 40,
+    'seed': 1,
+}
+
+ARG_TYPES = [
+    'int', 'uint', 'fixed', 'object', 'new_id', 'string', 'array', 'fd'
+]
+
+WORDS = (
+    'the surface buffer is attached to the output and committed after '
+    'damage of region is set client must not destroy object before '
+    'event is sent compositor may ignore request if seat has no pointer '
+    'keyboard or touch capability version of interface defines which '
+    'requests and events are available'
+).split()
+
+STABILITIES = ['stable', 'staging', 'unstable']
+
+
+class CorpusGenerator:
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.random = random.Random(settings['seed'])
+        self.interface_names = []
+
+    def words(self, n):
+        return ' '.join(self.random.choice(WORDS) for i in range(n))
+
+    def description(self, n):
+        return LBE.description(
+            {'summary': self.words(4)},
+            '\n' + self.words(n) + '\n'
+        )
+
+    def message(self, tag, name, interface_name):
+        s = self.settings
+        ret = LBE(
+            tag,
+            {'name': name},
+            self.description(s['description'] // 4)
+        )
+        for i in range(self.random.randint(0, s['args'] * 2)):
+            attrs = {
+                'name': 'arg_{}'.format(i),
+                'type': self.random.choice(ARG_TYPES),
+                'summary': self.words(3),
+            }
+            if (attrs['type'] in ['object', 'new_id']
+                    and len(self.interface_names) != 0):
+                attrs['interface'] = self.random.choice(self.interface_names)
+            if (attrs['type'] == 'uint'
+                    and s['enums'] != 0
+                    and self.random.random() < 0.3):
+                attrs['enum'] = '{}.enum_0'.format(interface_name)
+            ret.append(LBE.arg(attrs))
+        return ret
+
+    def interface(self, name):
+        s = self.settings
+        ret = LBE.interface(
+            {'name': name, 'version': str(self.random.randint(1, 9))},
+            self.description(s['description'])
+        )
+        for tag, prefix in [('request', 'req'), ('event', 'evt')]:
+            for i in range(self.random.randint(0, s['messages'] * 2)):
+                ret.append(
+                    self.message(tag, '{}_{}'.format(prefix, i), name))
+        for i in range(s['enums']):
+            enum = LBE.enum(
+                {'name': 'enum_{}'.format(i)},
+                self.description(s['description'] // 4)
+            )
+            for j in range(self.random.randint(1, s['entries'] * 2)):
+                enum.append(
+                    LBE.entry({
+                        'name': 'entry_{}'.format(j),
+                        'value': str(j),
+                        'summary': self.words(3),
+                    })
+                )
+            ret.append(enum)
+        return ret
+
+    def protocol(self, name):
+        ret = LBE.protocol(
+            {'name': name},
+            LBE.copyright('\n' + self.words(30) + '\n'),
+            self.description(self.settings['description'])
+        )
+        for i in range(self.settings['interfaces']):
+            interface_name = '{}_if{}'.format(name.replace('-', '_'), i)
+            ret.append(self.interface(interface_name))
+            self.interface_names.append(interface_name)
+        return ret
+
+    def write(self, directory):
+
+        # returns list of written files
+
+        ret = []
+
+        names = [('wayland/protocol', 'wayland')]
+        for i in range(self.settings['files'] - 1):
+            name = 'proto-{:04d}'.format(i)
+            stability = STABILITIES[i % len(STABILITIES)]
+            names.append(
+                ('protocols/{}/{}'.format(stability, name), name + '-v1'))
+
+        for dirname, name in names:
+            path = os.path.join(directory, dirname)
+            os.makedirs(path, exist_ok=True)
+            filename = os.path.join(path, name + '.xml')
+            with open(filename, 'wb') as f:
+                f.write(
+                    lxml.etree.tostring(
+                        self.protocol(name),
+                        pretty_print=True,
+                        xml_declaration=True,
+                        encoding='UTF-8'
+                    )
+                )
+            ret.append(filename)
+
+        return ret
+
+
+def generate_corpus(directory, settings=None):
+    s = dict(DEFAULTS)
+    if settings is not None:
+        s.update(settings)
+    return CorpusGenerator(s).write(directory)
+
+
+def print_help():
+    print(
+        """
+{cmd} [options] output_dir
+
+  --files N          - number of protocol files. default is {files}
+  --interfaces N     - interfaces per protocol. default is {interfaces}
+  --messages N       - average requests and events per interface (each).
+                       default is {messages}
+  --args N           - average arguments per message. default is {args}
+  --enums N          - enums per interface. default is {enums}
+  --entries N        - average entries per enum. default is {entries}
+  --description N    - words in protocol and interface descriptions
+                       (message and enum ones get quarter of it). default
+                       is {description}
+  --seed N           - random seed. default is {seed}
+""".format(cmd=sys.argv[0], **DEFAULTS))
+
+
+def parse_settings(opts):
+    ret = dict()
+    for k, v in opts:
+        name = k.lstrip('-')
+        if name in DEFAULTS:
+            try:
+                ret[name] = int(v)
+            except ValueError:
+                ret[name] = -1
+            if ret[name] < 0:
+                raise RuntimeError(
+                    "{} value must be non-negative integer".format(k))
+    return ret
+
+
+def main():
+
+    opts, args = getopt.getopt(
+        sys.argv[1:],
+        'h',
+        ['help'] + [i + '=' for i in DEFAULTS]
+    )
+
+    for i in opts:
+        if i[0] in ['-h', '--help']:
+            print_help()
+            return
+
+    if len(args) != 1:
+        raise RuntimeError("output directory required")
+
+    files = generate_corpus(args[0], parse_settings(opts))
+
+    size = 0
+    for i in files:
+        size += os.path.getsize(i)
+
+    print("written {} files, {} bytes into {}".format(
+        len(files), size, args[0]))
+
+
+if __name__ == '__main__':
+    main()
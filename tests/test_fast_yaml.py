@@ -0,0 +1,104 @@
+import contextlib
+import io
+import os.path
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import yaml
+
+sys.path.insert(
+    0,
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+)
+
+import wpd  # noqa: E402
+
+
+# --fast-yaml must fall back to python emitter, when pyyaml is built
+# without libyaml, and then output must be the same as without the option
+
+PROTOCOL_XML = '''<?xml version="1.0" encoding="UTF-8"?>
+<protocol name="test_fast_yaml">
+  <copyright>
+    Copyright text, which is long enough to be wrapped by yaml emitter at
+    some place, when it's written as one scalar.
+  </copyright>
+  <description summary="protocol for yaml emitter test">
+    Long description text. Python and libyaml emitters wrap long plain and
+    quoted scalars at different places, so any difference in emitter used
+    is seen in output of this text: "quoted words", 'single quoted words',
+    colons: and #hashes.
+  </description>
+  <interface name="test_thing" version="2">
+    <description summary="thing with requests, events and enums">
+      Interface description, which is long enough to be wrapped too, as
+      descriptions of real protocols are.
+    </description>
+    <request name="destroy" type="destructor">
+      <description summary="destroy the thing"/>
+    </request>
+    <request name="set_size">
+      <description summary="set size">
+        Sets size of the thing in surface-local coordinates.
+      </description>
+      <arg name="width" type="int" summary="width, must be positive"/>
+      <arg name="height" type="int" summary="height, must be positive"/>
+    </request>
+    <event name="done">
+      <arg name="serial" type="uint" summary="serial of configure"/>
+    </event>
+    <enum name="error">
+      <entry name="invalid_size" value="0" summary="size is not positive"/>
+      <entry name="defunct" value="1"/>
+    </enum>
+  </interface>
+</protocol>
+'''
+
+
+def run_wpd(directory, args):
+    argv = [os.path.join(directory, 'wpd.py')] + args
+    with mock.patch.object(sys, 'argv', argv):
+        with contextlib.redirect_stdout(io.StringIO()):
+            wpd.main()
+
+
+class FastYamlTest(unittest.TestCase):
+
+    def setUp(self):
+        self.addCleanup(wpd.set_yaml_dumper, False)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.directory = tmp.name
+        os.makedirs(os.path.join(self.directory, 'protocols'))
+        filename = os.path.join(
+            self.directory, 'protocols', 'test-fast-yaml.xml')
+        with open(filename, 'w') as f:
+            f.write(PROTOCOL_XML)
+
+    def generate(self, name, args):
+        output = os.path.join(self.directory, name)
+        run_wpd(self.directory, args + ['-o', output, 'yaml'])
+        with open(output, 'rb') as f:
+            return f.read()
+
+    def test_without_libyaml(self):
+        default = self.generate('default.yaml', [])
+
+        # getattr() makes the same result for pyyaml without libyaml
+        if hasattr(yaml, 'CDumper'):
+            with mock.patch.object(yaml, 'CDumper'):
+                del yaml.CDumper
+                fast = self.generate('fast.yaml', ['--fast-yaml'])
+        else:
+            fast = self.generate('fast.yaml', ['--fast-yaml'])
+
+        self.assertIs(wpd.YAML_DUMPER, yaml.Dumper)
+        self.assertNotEqual(default, b'')
+        self.assertEqual(fast, default)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,9 +1,32 @@
 import os.path
 import sys
 
-import functools
+import array
+import asyncio
+import collections
+import cProfile
+import concurrent.futures
+import contextlib
+import ctypes
+import ctypes.util
+import fnmatch
 import getopt
+import gzip
+import hashlib
+import http
+import io
 import json
+import lzma
+import pickle
+import select
+import shutil
+import sqlite3
+import struct
+import tempfile
+import textwrap
+import time
+import tracemalloc
+import urllib.parse
 
 import yaml
 
@@ -11,6 +34,17 @@ import lxml.etree
 
 from lxml.builder import E as LBE
 
+# search index format and tokenization are shared with the query tool
+from wpd_search import (
+    SEARCH_INDEX_VERSION, SEARCH_KINDS, delta_encode, search_tokens
+)
+
+# binary target layout is shared with its loader
+from wpd_binary import (
+    BINARY_HEADER, BINARY_MAGIC, BINARY_RECORDS, BINARY_SECTIONS,
+    BINARY_VERSION
+)
+
 
 # from yaml import load, dump
 # from yaml import Loader, Dumper
@@ -26,46 +60,321 @@ KNOWN_STABLE = ['wayland.xml']
 KNOWN_STAGING = []
 KNOWN_UNSTABLE = []
 
+# if basename is not in KNOWN_* lists, first of these directory names found
+# in file's dirname gives its stability
+STABILITY_DIRS = [
+    ['stable', 'stable'],
+    ['unstable', 'unstable'],
+    ['staging', 'staging'],
+]
+
 PREDEFINED_ORDER = ['wayland.xml']
 
+# directories, which are not descended into while searching for .xml files.
+# hidden directories (.git, .hg, ...) are skipped too
+SKIP_DIRS = ['tests', 'CVS', '_darcs', '__pycache__', 'build', 'builddir']
+
 CPP_DISABLE_TEXTS = True
 
+HTML_STYLE = '''
+            body { font-size: 10px; font-family: "Go Mono"; margin: 0; padding: 0;}
+            #main-div {
+                position: absolute;
+                left: 210px;
+                right: 210px;
+                top: 0px;
+                bottom: 0px;
+                overflow: scroll;
+                padding-left: 20px;
+                padding-right: 20px;
+                }
+            #main-div table { font-size: 10px; font-family: "Go Mono"; }
+            #main-div div {  }
+            #supertoc-div {
+                   position: fixed;
+                   top: 0px; left: 0px; bottom: 0px; width: 200px;
+                   overflow: scroll; padding-top: 20px; padding-bottom: 20px;
+                   text-wrap: nowrap;white-space: nowrap;
+                   border: 5px black dotted;
+                }
+            #toc-div {
+                   position: fixed;
+                   top: 0px; right: 0px; bottom: 0px; width: 200px;
+                   overflow: scroll; padding-top: 20px; padding-bottom: 20px;
+                   text-wrap: nowrap;white-space: nowrap;
+                   border: 5px black dotted;
+                }
+            #toc-div .level1 {margin-left: 0px; margin-top: 10px; }
+            #toc-div .level2 {margin-left: 10px; margin-top: 5px;  }
+            #toc-div .level3 {margin-left: 20px; }
+            #toc-div .level1 a {color: red;}
+            #toc-div .level2 a {color: teal;}
+            #toc-div .level3 a {color: maroon;}
+            .protocol-name {
+               font-size: 20px;
+               border: 3px solid black;
+               border-radius: 5px;
+               padding: 5px;
+               margin: 0 !important;
+            }
+            .protocol-div div {margin-left: 10px;}
+            .interface-name {color: green;}
+            .request-name, .event-name, .enum-name {color: maroon; font-size: 13px;}
+            .requests-div, .events-div, .enums-div {border: 2px solid silver; box-shadow: 2px 2px 0px gold; padding-bottom: 10px; margin-bottom: 5px;}
+            .interface-title { color: blue; }
+            .interface-div { margin-bottom: 5px; border: 1px gray dotted; padding: 5px; border-radius: 5px;}
+            .description-div { color: grey; padding: 2px; padding-left: 20px; padding-right: 20px; border: 1px grey dotted; text-align: justify; margin-left: 20px; margin-bottom:5px;}
+            .args-table { margin-left: 20px; /* width: 100%; */ }
+            .args-table td { padding-left: 10px; padding-right: 10px; border: 1px gray solid; box-shadow: 2px 2px 0px teal;}
+            .args-table th { text-align: left; }
+            .arg-name { }
+
+            '''
+
+# increment this when model classes change, so old cache entries are ignored
+CACHE_VERSION = 4
+
+# compressed variants of output files, which can be written along with them.
+# format name -> filename suffix
+COMPRESS_FORMATS = {
+    'gzip': '.gz',
+    'xz': '.xz',
+}
+
+# default compression levels, if not given by --compress-level
+COMPRESS_DEFAULT_LEVELS = {
+    'gzip': 9,
+    'xz': 6,
+}
+
+ARTIFACT_BUFFER_SIZE = 64 * 1024
+
+# watch mode: events coming within this time (seconds) after previous one
+# are handled together, as editors make several writes on save
+WATCH_DEBOUNCE = 0.1
+WATCH_POLL_INTERVAL = 1.0
+
+# from linux/inotify.h
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_EVENT = struct.Struct('iIII')
+
+# serve target. it's meant for local use, so listens on localhost by default
+SERVE_HOST = '127.0.0.1'
+SERVE_PORT = 8000
+# number of rendered files kept in memory
+SERVE_CACHE_SIZE = 64
+SERVE_CONTENT_TYPES = {
+    '.html': 'text/html; charset=utf-8',
+    '.css': 'text/css; charset=utf-8',
+    '.json': 'application/json',
+}
+
+
+class SymbolTable:
+
+    # identifiers (names, argument types, interface names, versions, entry
+    # values) are repeated thousands of times across the tree. they are
+    # stored in the tree as single shared str object each, so identifiers
+    # can be compared by identity and their encoded forms can be cached
+
+    def __init__(self):
+        self.symbols = dict()
+        self.json_encoded = dict()
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def intern(self, txt):
+        return self.symbols.setdefault(txt, txt)
+
+    def is_symbol(self, txt):
+        return self.symbols.get(txt) is txt
+
+    def json(self, txt):
+        ret = self.json_encoded.get(txt)
+        if ret is None:
+            ret = json.encoder.encode_basestring_ascii(txt)
+            self.json_encoded[txt] = ret
+        return ret
+
+
+SYMBOLS = SymbolTable()
+
+
+def intern_ProtocolFile_symbols(protocol_file):
+
+    # for trees made in other processes or loaded from cache: unpickling
+    # creates new str objects
+
+    intern = SYMBOLS.intern
+
+    for protocol in protocol_file.protocols:
+        protocol.name = intern(protocol.name)
+
+        for interface in protocol.interfaces:
+            interface.name = intern(interface.name)
+            interface.version = intern(interface.version)
+
+            for message in interface.requests + interface.events:
+                message.name = intern(message.name)
+                for arg in message.arguments:
+                    arg.name = intern(arg.name)
+                    arg.type_ = intern(arg.type_)
+                    arg.interface = intern(arg.interface)
+                    arg.enum = intern(arg.enum)
+
+            for enum in interface.enums:
+                enum.name = intern(enum.name)
+                for entry in enum.entries:
+                    entry.name = intern(entry.name)
+                    entry.value = intern(entry.value)
+
+
+def prune_symbols(protocol_files):
+
+    # symbols of replaced and removed protocol files stay in SYMBOLS (watch
+    # and serve). table is made again from symbols of protocol_files: they
+    # are table's own str objects, so identity of symbols holds. cached json
+    # forms of dropped symbols are dropped too
+
+    SYMBOLS.symbols = dict()
+    for protocol_file in protocol_files:
+        intern_ProtocolFile_symbols(protocol_file)
+
+    json_encoded = dict()
+    for k, v in SYMBOLS.json_encoded.items():
+        if k in SYMBOLS.symbols:
+            json_encoded[k] = v
+    SYMBOLS.json_encoded = json_encoded
+
+
+def description_from_element(element):
+    t = element.text
+    if t is None:
+        t = ""
+    ret = Description()
+    ret.text = t.strip()
+    ret.summary = element.get('summary', '').strip()
+    return ret
+
+
+def copyright_from_element(element):
+    t = element.text
+    if t is None:
+        t = ""
+    ret = Copyright()
+    ret.text = t.strip()
+    ret.name = ''
+    return ret
+
+
+def argument_from_element(element):
+    intern = SYMBOLS.intern
+    ret = Argument()
+    ret.name = intern(element.get('name', ''))
+    ret.type_ = intern(element.get('type', ''))
+    ret.interface = intern(element.get('interface', ''))
+    ret.enum = intern(element.get('enum', ''))
+    ret.summary = element.get('summary', '')
+    return ret
+
+
+def entry_from_element(element):
+    ret = Entry()
+    ret.name = SYMBOLS.intern(element.get('name', ''))
+    ret.value = SYMBOLS.intern(element.get('value', ''))
+    ret.summary = element.get('summary', '')
+    return ret
+
+
+def apply_element_to_object(obj, element, handlers):
+
+    # children of element are visited once, in document order, and
+    # dispatched by tag. comments and unknown tags are skipped
+
+    obj.name = SYMBOLS.intern(element.get('name', ''))
+
+    for child in element:
+        handler = handlers.get(child.tag)
+        if handler is not None:
+            handler(obj, child)
+
+
+def _add_description(obj, element):
+    obj.descriptions.append(description_from_element(element))
+
+
+def _add_copyright(obj, element):
+    obj.copyrights.append(copyright_from_element(element))
 
-def apply_common_fields_to_object_from_element(obj, element):
 
-    obj.name = element.get('name', '')
+def _add_argument(obj, element):
+    obj.arguments.append(argument_from_element(element))
 
-    descr_os = []
 
-    descrs = element.xpath('description')
+def _add_entry(obj, element):
+    obj.entries.append(entry_from_element(element))
 
-    for descr in descrs:
-        t = descr.text
-        if t is None:
-            t = ""
-        d = Description()
-        d.text = t.strip()
-        d.summary = descr.get('summary', '').strip()
 
-        descr_os.append(d)
+def _add_request(obj, element):
+    request_o = Request()
+    apply_element_to_object(request_o, element, MESSAGE_CHILD_HANDLERS)
+    obj.requests.append(request_o)
 
-    obj.descriptions = descr_os
 
-    copy_os = []
+def _add_event(obj, element):
+    event_o = Event()
+    apply_element_to_object(event_o, element, MESSAGE_CHILD_HANDLERS)
+    obj.events.append(event_o)
 
-    copys = element.xpath('copyright')
 
-    for copy in copys:
-        t = copy.text
-        if t is None:
-            t = ""
-        d = Copyright()
-        d.text = t.strip()
-        d.name = ''
+def _add_enum(obj, element):
+    enum_o = Enum()
+    apply_element_to_object(enum_o, element, ENUM_CHILD_HANDLERS)
+    obj.enums.append(enum_o)
 
-        copy_os.append(d)
 
-    obj.copyrights = copy_os
+def _add_interface(obj, element):
+    interf_o = Interface()
+    apply_element_to_object(interf_o, element, INTERFACE_CHILD_HANDLERS)
+    interf_o.version = SYMBOLS.intern(element.get('version', '0'))
+    obj.interfaces.append(interf_o)
+
+
+COMMON_CHILD_HANDLERS = {
+    'description': _add_description,
+    'copyright': _add_copyright,
+}
+
+PROTOCOL_CHILD_HANDLERS = dict(
+    COMMON_CHILD_HANDLERS,
+    interface=_add_interface,
+)
+
+INTERFACE_CHILD_HANDLERS = dict(
+    COMMON_CHILD_HANDLERS,
+    request=_add_request,
+    event=_add_event,
+    enum=_add_enum,
+)
+
+MESSAGE_CHILD_HANDLERS = dict(
+    COMMON_CHILD_HANDLERS,
+    arg=_add_argument,
+)
+
+ENUM_CHILD_HANDLERS = dict(
+    COMMON_CHILD_HANDLERS,
+    entry=_add_entry,
+)
 
 
 def gen_descriptions_html(descriptions):
@@ -83,7 +392,7 @@ def gen_descriptions_html(descriptions):
     return descriptions_div
 
 
-def gen_messages_html(messages, toc, idname_2, mode='requests'):
+def gen_messages_html(messages, toc, idname_2, mode='requests', xref=None):
 
     single_txt = 'request'
     short_txt = 'req'
@@ -133,10 +442,17 @@ def gen_messages_html(messages, toc, idname_2, mode='requests'):
                     {'class': 'args-table'}
                 )
                 for arg in args:
+                    interface_td = LBE.td(arg.interface)
+                    if xref is not None:
+                        href = xref.interface_href(arg.interface)
+                        if href is not None:
+                            interface_td = LBE.td(
+                                LBE.a({'href': href}, arg.interface)
+                            )
                     arg_row = LBE.tr(
                         LBE.td(LBE.b(arg.name, {'class': 'arg-name'})),
                         LBE.td(arg.type_),
-                        LBE.td(arg.interface),
+                        interface_td,
                         LBE.td(arg.summary),
                     )
                     args_table.append(arg_row)
@@ -168,18 +484,6 @@ def gen_messages_html(messages, toc, idname_2, mode='requests'):
     return messages_div
 
 
-def apply_args_to_object(obj, element):
-    args = element.xpath('arg')
-    for arg in args:
-        arg_o = Argument()
-        arg_o.name = arg.get('name', '')
-        arg_o.type_ = arg.get('type', '')
-        arg_o.interface = arg.get('interface', '')
-        arg_o.summary = arg.get('summary', '')
-
-        obj.arguments.append(arg_o)
-
-
 def arguments_simple_struct(requset_or_event):
 
     ret = []
@@ -223,13 +527,45 @@ def common_fields_from_obj_to_simple_struct(lst, obj):
     lst.append(['descriptions', descriptions])
 
 
-class Copyright:
+def write_cpp_list(out, objs):
+    first = True
+    for i in objs:
+        if not first:
+            out.write(',')
+        first = False
+        i.write_cpp(out)
+
+
+class CppCode:
+
+    # write_cpp() of each class appends its code to 'out' (file or
+    # io.StringIO) and calls write_cpp() of children in place, so every
+    # byte is written once, whatever the nesting level is
+
+    # model classes use __slots__: big corpus makes hundreds of thousands of
+    # Argument, Entry and Description objects, and per-instance __dict__ is
+    # the most of their size
+
+    __slots__ = ()
+
+    def write_cpp(self, out):
+        raise NotImplementedError()
+
+    def gen_cpp(self):
+        out = io.StringIO()
+        self.write_cpp(out)
+        return out.getvalue()
+
+
+class Copyright(CppCode):
+
+    __slots__ = ('name', 'text')
 
     def __init__(self):
         self.name = ''
         self.text = ''
 
-    def gen_cpp(self):
+    def write_cpp(self, out):
         n = ""
         t = ""
 
@@ -237,21 +573,23 @@ class Copyright:
             n = self.name
             t = self.text
 
-        return '''
+        out.write('''
         Copyright{
            .name="'''+n+'''",
            .text=R"+++('''+t+''')+++"
         }
-        '''
+        ''')
 
 
-class Description:
+class Description(CppCode):
+
+    __slots__ = ('text', 'summary')
 
     def __init__(self):
         self.text = ''
         self.summary = ''
 
-    def gen_cpp(self):
+    def write_cpp(self, out):
         s = ""
         t = ""
 
@@ -259,116 +597,368 @@ class Description:
             s = self.summary
             t = self.text
 
-        return '''
+        out.write('''
         Description{
            .summary=R"+++('''+s+''')+++",
            .text=R"+++('''+t+''')+++"
            }
-           '''
+           ''')
 
 
-class CommonFields:
+class CommonFields(CppCode):
+
+    __slots__ = ('name', 'descriptions', 'copyrights')
 
     def __init__(self):
         self.name = ''
         self.descriptions = []
         self.copyrights = []
 
-    def gen_cpp(self):
+    def write_cpp(self, out):
+
+        out.write('''
+CommonFields{
+        .name="'''+self.name+'''",
+        .descriptions={''')
+        write_cpp_list(out, self.descriptions)
+        out.write('''},
+        .copyrights={''')
+        write_cpp_list(out, self.copyrights)
+        out.write('''}
+    }
+''')
+
+
+class ProtocolIndex:
 
-        descriptions_code_lst = []
+    # name -> list of objects dictionaries. names are not guaranteed to be
+    # unique in corpus, so lists are used. requests, events and enums are
+    # keyed by qualified names ('wl_surface.attach', 'wl_output.transform'),
+    # entries - by 'wl_output.transform.normal'. parents maps protocols,
+    # interfaces, messages, enums and entries to object containing them
 
-        for i in self.descriptions:
-            descriptions_code_lst.append(i.gen_cpp())
+    def __init__(self):
+        self.protocols = dict()
+        self.interfaces = dict()
+        self.requests = dict()
+        self.events = dict()
+        self.enums = dict()
+        self.entries = dict()
+        self.parents = dict()
+
+    def _add(self, dct, name, obj, parent):
+        lst = dct.get(name)
+        if lst is None:
+            lst = []
+            dct[name] = lst
+        lst.append(obj)
+        self.parents[obj] = parent
+
+    def _remove(self, dct, name, obj):
+        lst = dct.get(name, [])
+        for i in range(len(lst)):
+            if lst[i] is obj:
+                del lst[i]
+                break
+        if len(lst) == 0:
+            dct.pop(name, None)
+        self.parents.pop(obj, None)
+
+    def _walk(self, protocol_file, func):
+        for protocol in protocol_file.protocols:
+            func(self.protocols, protocol.name, protocol, protocol_file)
+            for interface in protocol.interfaces:
+                func(self.interfaces, interface.name, interface, protocol)
+                for dct, lst in [
+                        (self.requests, interface.requests),
+                        (self.events, interface.events),
+                        (self.enums, interface.enums),
+                ]:
+                    for i in lst:
+                        func(dct, interface.name + '.' + i.name, i, interface)
+                for enum in interface.enums:
+                    for entry in enum.entries:
+                        func(
+                            self.entries,
+                            interface.name + '.' + enum.name + '.' + entry.name,
+                            entry,
+                            enum
+                        )
 
-        descriptions_code = ','.join(descriptions_code_lst)
+    def add_protocol_file(self, protocol_file):
+        self._walk(protocol_file, self._add)
 
-        copyrights_code_lst = []
+    def remove_protocol_file(self, protocol_file):
+        self._walk(
+            protocol_file,
+            lambda dct, name, obj, parent: self._remove(dct, name, obj)
+        )
 
-        for i in self.copyrights:
-            copyrights_code_lst.append(i.gen_cpp())
+    def _get(self, dct, name):
+        lst = dct.get(name)
+        if lst is None:
+            return None
+        return lst[0]
 
-        copyrights_code = ','.join(copyrights_code_lst)
+    def get_protocol(self, name):
+        return self._get(self.protocols, name)
 
-        ret = '''
-CommonFields{
-        .name="'''+self.name+'''",
-        .descriptions={'''+descriptions_code+'''},
-        .copyrights={'''+copyrights_code+'''}
-    }
-'''
+    def get_interface(self, name):
+        return self._get(self.interfaces, name)
+
+    def get_request(self, qualified_name):
+        return self._get(self.requests, qualified_name)
+
+    def get_event(self, qualified_name):
+        return self._get(self.events, qualified_name)
+
+    def get_enum(self, qualified_name):
+        return self._get(self.enums, qualified_name)
+
+    def get_entry(self, qualified_name):
+        return self._get(self.entries, qualified_name)
+
+    def lookup(self, name):
+
+        # all objects with given plain or qualified name
+
+        ret = []
+        dots = name.count('.')
+        if dots == 0:
+            dcts = [self.protocols, self.interfaces]
+        elif dots == 1:
+            dcts = [self.requests, self.events, self.enums]
+        else:
+            dcts = [self.entries]
+        for i in dcts:
+            ret += i.get(name, [])
         return ret
 
+    def parent(self, obj):
+        return self.parents.get(obj)
+
+    def protocol_file_of(self, obj):
+        while obj is not None and not isinstance(obj, ProtocolFile):
+            obj = self.parents.get(obj)
+        return obj
+
+
+class InterfaceGraph:
+
+    # interface cross-references, computed once from the whole collection.
+    # all dictionaries are keyed by interface name (enum_users - by
+    # qualified enum name) and hold lists in document order:
+    #
+    #   references - interfaces, referenced by interface's messages
+    #                (object/new_id arguments and enum arguments)
+    #   referrers  - reverse of references
+    #   creators   - messages with new_id argument of the interface
+    #   acceptors  - messages with object argument of the interface
+    #   enum_users - messages with arguments of the enum
+
+    def __init__(self):
+        self.references = dict()
+        self.referrers = dict()
+        self.creators = dict()
+        self.acceptors = dict()
+        self.enum_users = dict()
+        self.interface_ids = dict()
+
+    def _add_unique(self, dct, name, obj):
+        lst = dct.get(name)
+        if lst is None:
+            lst = []
+            dct[name] = lst
+        for i in lst:
+            if i is obj:
+                return
+        lst.append(obj)
+
+    def _add_message(self, interface, message):
+        for arg in message.arguments:
+            targets = []
+
+            if arg.interface != '':
+                targets.append(arg.interface)
+                if arg.type_ == 'new_id':
+                    self._add_unique(self.creators, arg.interface, message)
+                elif arg.type_ == 'object':
+                    self._add_unique(self.acceptors, arg.interface, message)
+
+            if arg.enum != '':
+                enum_interface = interface.name
+                enum_name = arg.enum
+                if '.' in arg.enum:
+                    enum_interface, enum_name = arg.enum.split('.', 1)
+                targets.append(enum_interface)
+                self._add_unique(
+                    self.enum_users,
+                    enum_interface + '.' + enum_name,
+                    message
+                )
+
+            for i in targets:
+                if i != interface.name:
+                    self._add_unique(self.references, interface.name, i)
+                    self._add_unique(self.referrers, i, interface.name)
+
+    def add_protocol_file(self, protocol_file):
+        for protocol in protocol_file.protocols:
+            for interface in protocol.interfaces:
+                self.interface_ids.setdefault(
+                    interface.name,
+                    protocol.name + '-' + interface.name
+                )
+                for message in interface.requests + interface.events:
+                    self._add_message(interface, message)
+
+    def get_references(self, name):
+        return list(self.references.get(name, []))
+
+    def get_referrers(self, name):
+        return list(self.referrers.get(name, []))
 
-class ProtocolCollection:
+    def get_creators(self, name):
+        return list(self.creators.get(name, []))
+
+    def get_acceptors(self, name):
+        return list(self.acceptors.get(name, []))
+
+    def get_enum_users(self, qualified_name):
+        return list(self.enum_users.get(qualified_name, []))
+
+    def interface_href(self, name):
+
+        # link to interface's div in generated html, None if interface is
+        # not in collection
+
+        i = self.interface_ids.get(name)
+        if i is None:
+            return None
+        return '#' + i
+
+
+def generate_InterfaceGraph(protocol_collection):
+    ret = InterfaceGraph()
+    for i in protocol_collection.protocol_files:
+        ret.add_protocol_file(i)
+    return ret
+
+
+class ProtocolCollection(CppCode):
+
+    # protocol_files may be changed directly only before index is built.
+    # after that use add_protocol_file(), remove_protocol_file() and
+    # replace_protocol_file(), which keep index up to date. cross-reference
+    # graph is rebuilt on next get_xref() call after changes
 
     def __init__(self):
         self.protocol_files = []
+        self.index = None
+        self.xref = None
 
-    def getProtoByName(self, name):
-        ret = []
+    def get_xref(self):
+        if self.xref is None:
+            self.xref = generate_InterfaceGraph(self)
+        return self.xref
+
+    def build_index(self):
+        self.index = ProtocolIndex()
         for i in self.protocol_files:
-            for j in i:
-                if j.name == name:
-                    ret.append(j)
-        return ret
+            self.index.add_protocol_file(i)
+        return self.index
+
+    def get_index(self):
+        if self.index is None:
+            self.build_index()
+        return self.index
+
+    def add_protocol_file(self, protocol_file):
+        self.protocol_files.append(protocol_file)
+        self.xref = None
+        if self.index is not None:
+            self.index.add_protocol_file(protocol_file)
+
+    def remove_protocol_file(self, protocol_file):
+        for i in range(len(self.protocol_files)):
+            if self.protocol_files[i] is protocol_file:
+                del self.protocol_files[i]
+                break
+        else:
+            raise ValueError("protocol file is not in collection")
+        self.xref = None
+        if self.index is not None:
+            self.index.remove_protocol_file(protocol_file)
+
+    def replace_protocol_file(self, old, new):
+        for i in range(len(self.protocol_files)):
+            if self.protocol_files[i] is old:
+                self.protocol_files[i] = new
+                break
+        else:
+            raise ValueError("protocol file is not in collection")
+        self.xref = None
+        if self.index is not None:
+            self.index.remove_protocol_file(old)
+            self.index.add_protocol_file(new)
+
+    def getProtoByName(self, name):
+        return list(self.get_index().protocols.get(name, []))
 
     def sort_protocol_files(self):
-        self.protocol_files.sort(
-            key=functools.cmp_to_key(self._protocol_files_sorter))
-
-    def _protocol_files_sorter(self, v1, v2):
-        if v1.basename in PREDEFINED_ORDER and v2.basename in PREDEFINED_ORDER:
-            i1 = PREDEFINED_ORDER.index(v1.basename)
-            i2 = PREDEFINED_ORDER.index(v2.basename)
-            if i1 == i2:
-                return 0
-            elif i1 > i2:
-                return 1
-            else:
-                return -1
 
-        elif v1.basename in PREDEFINED_ORDER and v2.basename not in PREDEFINED_ORDER:
-            return -1
-        elif v1.basename not in PREDEFINED_ORDER and v2.basename in PREDEFINED_ORDER:
-            return 1
+        # predefined files go first, in PREDEFINED_ORDER order. others are
+        # ordered by stability and basename. keys are computed once per file
 
-        else:
+        predefined = dict()
+        for i, name in enumerate(PREDEFINED_ORDER):
+            predefined.setdefault(name, i)
 
-            s1 = STABILITY_ORDER.index(v1.calc_stability())
-            s2 = STABILITY_ORDER.index(v2.calc_stability())
+        stability_rank = dict()
+        for i, name in enumerate(STABILITY_ORDER):
+            stability_rank.setdefault(name, i)
 
-            if s1 > s2:
-                return 1
-            elif s1 < s2:
-                return -1
+        known = known_stability_dict()
 
-            else:
+        for i in self.protocol_files:
+            i.stability = i.calc_stability(known)
 
-                if v1.basename > v2.basename:
-                    return 1
-                elif v1.basename < v2.basename:
-                    return -1
-                else:
-                    return 0
+        def key(v):
+            p = predefined.get(v.basename)
+            if p is not None:
+                return (0, p, '')
+            return (1, stability_rank[v.stability], v.basename)
 
-    def gen_cpp(self):
+        self.protocol_files.sort(key=key)
 
-        protocol_files_lst = []
-        for i in self.protocol_files:
-            protocol_files_lst.append(i.gen_cpp())
+    def write_cpp(self, out, fragments=None):
+        for i in self.write_cpp_steps(out, fragments):
+            pass
 
-        protocol_files_txt = ','.join(protocol_files_lst)
+    def write_cpp_steps(self, out, fragments=None):
 
-        ret = '''
+        # write_cpp(), which yields after each protocol file. fragments -
+        # OutputFragments with code of protocol files
+
+        out.write('''
 const ProtocolCollection WAYLAND_PROTOCOL_COLLECTION =
 {
    .protocol_files = {
-''' + protocol_files_txt + '''
+''')
+        first = True
+        for i in self.protocol_files:
+            if not first:
+                out.write(',')
+            first = False
+            if fragments is None:
+                i.write_cpp(out)
+            else:
+                out.write(fragments.get(i, ProtocolFile.gen_cpp))
+            yield
+        out.write('''
    }
 };
-'''
-        return ret
+''')
 
 
 class ProtocolFile(CommonFields):
@@ -376,91 +966,83 @@ class ProtocolFile(CommonFields):
     # TODO: read common fields from xml
     # TODO: write common fields to outputs
 
+    # stability is set by ProtocolCollection.sort_protocol_files()
+
+    __slots__ = ('basename', 'dirname', 'protocols', 'stability')
+
     def __init__(self):
         super().__init__()
         self.basename = ''
         self.dirname = ''
         self.protocols = []
+        self.stability = None
 
-    def calc_stability(self):
-        if self.basename in KNOWN_STABLE:
-            return 'stable'
+    def calc_stability(self, known=None):
 
-        if self.basename in KNOWN_STAGING:
-            return 'staging'
+        # known - result of known_stability_dict(), to not rebuild it for
+        # each file
 
-        if self.basename in KNOWN_UNSTABLE:
-            return 'unstable'
+        if known is None:
+            known = known_stability_dict()
 
-        splitted = self.dirname.split('/')
-
-        if 'stable' in splitted:
-            return 'stable'
+        ret = known.get(self.basename)
+        if ret is not None:
+            return ret
 
-        if 'unstable' in splitted:
-            return 'unstable'
+        splitted = self.dirname.split('/')
 
-        if 'staging' in splitted:
-            return 'staging'
+        for dirname, stability in STABILITY_DIRS:
+            if dirname in splitted:
+                return stability
 
         return 'unknown'
 
-    def gen_cpp(self):
-
-        protocols_code = ''
-        protocols_code_lst = []
-
-        for i in self.protocols:
-            protocols_code_lst.append(i.gen_cpp())
-
-        protocols_code = ','.join(protocols_code_lst)
-
-        del protocols_code_lst
+    def write_cpp(self, out):
 
-        ret = '''
+        out.write('''
 
         {
-        '''+super().gen_cpp()+''',
+        ''')
+        super().write_cpp(out)
+        out.write(''',
         "'''+self.basename+'''",
         "'''+self.dirname+'''",
-        {'''+protocols_code+'''}
+        {''')
+        write_cpp_list(out, self.protocols)
+        out.write('''}
         }
 
 
-'''
-
-        return ret
+''')
 
 
 class Protocol(CommonFields):
 
+    __slots__ = ('interfaces',)
+
     def __init__(self):
         super().__init__()
         # self.status = 'unstable'
         self.interfaces = []
 
-    def gen_cpp(self):
-
-        interfaces_code_list = []
-
-        for i in self.interfaces:
-            interfaces_code_list.append(i.gen_cpp())
+    def write_cpp(self, out):
 
-        interfaces_code = ','.join(interfaces_code_list)
-
-        ret = '''
+        out.write('''
         Protocol(
-            '''+super().gen_cpp()+''',
-            {'''+interfaces_code+'''}
+            ''')
+        super().write_cpp(out)
+        out.write(''',
+            {''')
+        write_cpp_list(out, self.interfaces)
+        out.write('''}
             )
-'''
-        #
-
-        return ret
+''')
 
 
 class Interface(CommonFields):
 
+    __slots__ = ('version', 'requests', 'events', 'enums')
+
     def __init__(self):
         super().__init__()
         self.version = '0'
@@ -468,81 +1050,80 @@ class Interface(CommonFields):
         self.events = []
         self.enums = []
 
-    def gen_cpp(self):
-
-        requests_code_list = []
-        events_code_list = []
-        enums_code_list = []
-
-        for i in self.requests:
-            requests_code_list.append(i.gen_cpp())
-
-        for i in self.events:
-            events_code_list.append(i.gen_cpp())
-
-        for i in self.enums:
-            enums_code_list.append(i.gen_cpp())
-
-        requests_code = ','.join(requests_code_list)
-        events_code = ','.join(events_code_list)
-        enums_code = ','.join(enums_code_list)
+    def write_cpp(self, out):
 
-        ret = '''
+        out.write('''
         Interface(
-        '''+super().gen_cpp()+''',
+        ''')
+        super().write_cpp(out)
+        out.write(''',
         "'''+self.version+'''",
-        {'''+requests_code+'''},
-        {'''+events_code+'''},
-        {'''+enums_code+'''}
+        {''')
+        write_cpp_list(out, self.requests)
+        out.write('''},
+        {''')
+        write_cpp_list(out, self.events)
+        out.write('''},
+        {''')
+        write_cpp_list(out, self.enums)
+        out.write('''}
         )
-'''
-
-        return ret
+''')
 
 
 class Message(CommonFields):
 
+    __slots__ = ('arguments',)
+
     def __init__(self):
         super().__init__()
         self.arguments = []
 
-    def gen_cpp(self):
-
-        arguments_code_list = []
-
-        for i in self.arguments:
-            arguments_code_list.append(i.gen_cpp())
+    def write_cpp(self, out):
 
-        arguments_code = ','.join(arguments_code_list)
-
-        ret = '''
+        out.write('''
         Message(
-            '''+super().gen_cpp()+''',
-            {'''+arguments_code+'''}
+            ''')
+        super().write_cpp(out)
+        out.write(''',
+            {''')
+        write_cpp_list(out, self.arguments)
+        out.write('''}
             )
-'''
-        return ret
+''')
 
 
 class Request(Message):
+
+    __slots__ = ()
+
     def __init__(self):
         super().__init__()
 
 
 class Event(Message):
+
+    __slots__ = ()
+
     def __init__(self):
         super().__init__()
 
 
-class Argument:
+class Argument(CppCode):
+
+    # enum is written only to binary output: elsewhere it's used for
+    # cross-references only
+
+    __slots__ = ('name', 'type_', 'interface', 'enum', 'summary')
 
     def __init__(self):
         self.name = ''
         self.type_ = ''
         self.interface = ''
+        self.enum = ''
         self.summary = ''
 
-    def gen_cpp(self):
+    def write_cpp(self, out):
 
         type_txt = 'wt_'+self.type_
 
@@ -550,61 +1131,579 @@ class Argument:
         if not CPP_DISABLE_TEXTS:
             summary = self.summary
 
-        return '''
+        out.write('''
         Argument{
         .name="'''+self.name+'''",
         .type='''+type_txt+''',
         .interface="'''+self.interface+'''",
         .summary="'''+summary+'''",
         }
-        '''
+        ''')
 
 
 class Enum(CommonFields):
 
+    __slots__ = ('entries',)
+
     def __init__(self):
         super().__init__()
         self.entries = []
 
-    def gen_cpp(self):
-        entries_code_list = []
-
-        for i in self.entries:
-            entries_code_list.append(i.gen_cpp())
+    def write_cpp(self, out):
 
-        entries_code = ','.join(entries_code_list)
-
-        ret = '''
+        out.write('''
         Enum(
-            '''+super().gen_cpp()+''',
-            {'''+entries_code+'''}
+            ''')
+        super().write_cpp(out)
+        out.write(''',
+            {''')
+        write_cpp_list(out, self.entries)
+        out.write('''}
             )
-'''
-        return ret
+''')
 
 
-class Entry:
+class Entry(CppCode):
+
+    __slots__ = ('name', 'value', 'summary')
+
     def __init__(self):
         self.name = ''
         self.value = ''
         self.summary = ''
 
-    def gen_cpp(self):
+    def write_cpp(self, out):
 
         summary = ""
         if not CPP_DISABLE_TEXTS:
             summary = self.summary
 
-        return '''
+        out.write('''
         Entry{
         .name="'''+self.name+'''",
         .value="'''+self.value+'''",
         .summary="'''+summary+'''",
         }
-        '''
+        ''')
+
+
+def known_stability_dict():
+    ret = dict()
+    # KNOWN_STABLE has priority, then KNOWN_STAGING, then KNOWN_UNSTABLE
+    for stability, lst in [
+            ('unstable', KNOWN_UNSTABLE),
+            ('staging', KNOWN_STAGING),
+            ('stable', KNOWN_STABLE),
+    ]:
+        for i in lst:
+            ret[i] = stability
+    return ret
 
 
-def parse_xml(filename):
+def load_order_config(filename):
+
+    # yaml (or json) file with any of these keys, replacing corresponding
+    # module settings:
+    #
+    #   stability_order: [stable, staging, unstable, unknown]
+    #   known_stable: [wayland.xml]
+    #   known_staging: []
+    #   known_unstable: []
+    #   stability_dirs: [[stable, stable], [unstable, unstable], ...]
+    #   predefined_order: [wayland.xml]
+
+    global STABILITY_ORDER
+    global KNOWN_STABLE
+    global KNOWN_STAGING
+    global KNOWN_UNSTABLE
+    global STABILITY_DIRS
+    global PREDEFINED_ORDER
+
+    with open(filename) as f:
+        cfg = yaml.safe_load(f)
+
+    if cfg is None:
+        cfg = dict()
+
+    if not isinstance(cfg, dict):
+        raise RuntimeError(
+            "{}: order config must be a mapping".format(filename))
+
+    def str_list(key, default):
+        ret = cfg.get(key, default)
+        if (not isinstance(ret, list)
+                or not all([isinstance(i, str) for i in ret])):
+            raise RuntimeError(
+                "{}: '{}' must be list of strings".format(filename, key))
+        return ret
+
+    unknown_keys = set(cfg) - set([
+        'stability_order', 'known_stable', 'known_staging',
+        'known_unstable', 'stability_dirs', 'predefined_order',
+    ])
+    if len(unknown_keys) != 0:
+        raise RuntimeError(
+            "{}: unknown order config keys: {}".format(
+                filename, ', '.join(sorted(unknown_keys))))
+
+    stability_order = str_list('stability_order', STABILITY_ORDER)
+    known_stable = str_list('known_stable', KNOWN_STABLE)
+    known_staging = str_list('known_staging', KNOWN_STAGING)
+    known_unstable = str_list('known_unstable', KNOWN_UNSTABLE)
+    predefined_order = str_list('predefined_order', PREDEFINED_ORDER)
+
+    stability_dirs = cfg.get('stability_dirs', STABILITY_DIRS)
+    if (not isinstance(stability_dirs, list)
+            or not all([
+                isinstance(i, list)
+                and len(i) == 2
+                and isinstance(i[0], str)
+                and isinstance(i[1], str)
+                for i in stability_dirs
+            ])):
+        raise RuntimeError(
+            "{}: 'stability_dirs' must be list of [dirname, stability]"
+            " pairs".format(filename))
+
+    used = set(['stable', 'staging', 'unstable', 'unknown'])
+    for i in stability_dirs:
+        used.add(i[1])
+    for i in used:
+        if i not in stability_order:
+            raise RuntimeError(
+                "{}: '{}' is missing in 'stability_order'".format(
+                    filename, i))
+
+    STABILITY_ORDER = stability_order
+    KNOWN_STABLE = known_stable
+    KNOWN_STAGING = known_staging
+    KNOWN_UNSTABLE = known_unstable
+    STABILITY_DIRS = stability_dirs
+    PREDEFINED_ORDER = predefined_order
+
+
+class ProtocolFileCache:
+
+    # each entry is a file with two pickles: small header (stat values,
+    # content hash and key) and the ProtocolFile itself (None for files
+    # which are not wayland protocols). header is checked before the model
+    # is loaded
+
+    def __init__(self, directory, max_size=0):
+        self.directory = os.path.abspath(directory)
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.pruned = 0
+        self._pending = dict()
+
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _entry_filename(self, filename):
+        h = hashlib.sha1(filename.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, h + '.pickle')
+
+    def _entry_filenames(self):
+        ret = []
+        for i in os.listdir(self.directory):
+            if i.endswith('.pickle'):
+                ret.append(os.path.join(self.directory, i))
+        return ret
+
+    def _file_hash(self, filename):
+        h = hashlib.sha256()
+        with open(filename, 'rb') as f:
+            while True:
+                buff = f.read(2 ** 20)
+                if len(buff) == 0:
+                    break
+                h.update(buff)
+        return h.hexdigest()
+
+    def get(self, filename):
+
+        filename = os.path.abspath(filename)
+        entry_filename = self._entry_filename(filename)
+
+        try:
+            st = os.stat(filename)
+        except OSError:
+            self.misses += 1
+            return False, None, None
+
+        header = None
+        try:
+            with open(entry_filename, 'rb') as f:
+                header = pickle.load(f)
+                if (header.get('version') != CACHE_VERSION
+                        or header.get('filename') != filename):
+                    header = None
+                elif (header['size'] == st.st_size
+                        and header['mtime_ns'] == st.st_mtime_ns):
+                    protocol_file = pickle.load(f)
+                    os.utime(entry_filename)
+                    self.hits += 1
+                    return True, header['key'], protocol_file
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print("can't load cache entry {}. error: {}".format(
+                entry_filename, e))
+            header = None
+
+        # size/mtime changed: file still may have same contents (touch,
+        # checkout), so compare hashes before deciding to reparse it
+
+        try:
+            sha256 = self._file_hash(filename)
+        except OSError:
+            self.misses += 1
+            return False, None, None
+
+        self._pending[filename] = (st.st_size, st.st_mtime_ns, sha256)
+
+        if header is not None and header['sha256'] == sha256:
+            try:
+                with open(entry_filename, 'rb') as f:
+                    pickle.load(f)
+                    protocol_file = pickle.load(f)
+            except Exception:
+                pass
+            else:
+                self.hits += 1
+                self._write_entry(
+                    filename,
+                    header['key'],
+                    protocol_file,
+                    *self._pending.pop(filename)
+                )
+                return True, header['key'], protocol_file
+
+        self.misses += 1
+        return False, None, None
+
+    def put(self, filename, key, protocol_file):
+
+        filename = os.path.abspath(filename)
+
+        if filename in self._pending:
+            size, mtime_ns, sha256 = self._pending.pop(filename)
+        else:
+            st = os.stat(filename)
+            size = st.st_size
+            mtime_ns = st.st_mtime_ns
+            sha256 = self._file_hash(filename)
+
+        self._write_entry(
+            filename,
+            key,
+            protocol_file,
+            size,
+            mtime_ns,
+            sha256
+        )
+
+        self.stored += 1
+
+    def _write_entry(
+            self,
+            filename,
+            key,
+            protocol_file,
+            size,
+            mtime_ns,
+            sha256
+    ):
+
+        header = {
+            'version': CACHE_VERSION,
+            'filename': filename,
+            'size': size,
+            'mtime_ns': mtime_ns,
+            'sha256': sha256,
+            'key': key,
+        }
+
+        entry_filename = self._entry_filename(filename)
+        tmp_filename = '{}.{}.tmp'.format(entry_filename, os.getpid())
+
+        with open(tmp_filename, 'wb') as f:
+            pickle.dump(header, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(protocol_file, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        os.replace(tmp_filename, entry_filename)
+
+    def clear(self):
+        for i in self._entry_filenames():
+            os.unlink(i)
+
+    def prune(self):
+
+        # removes least recently used entries until cache fits max_size
+
+        if self.max_size <= 0:
+            return
+
+        entries = []
+        total = 0
+        for i in self._entry_filenames():
+            st = os.stat(i)
+            entries.append((st.st_mtime_ns, st.st_size, i))
+            total += st.st_size
+
+        entries.sort()
+
+        for mtime_ns, size, i in entries:
+            if total <= self.max_size:
+                break
+            os.unlink(i)
+            total -= size
+            self.pruned += 1
+
+    def size(self):
+        ret = 0
+        for i in self._entry_filenames():
+            ret += os.stat(i).st_size
+        return ret
+
+    def stats_txt(self):
+        return "cache: {} hits, {} misses, {} stored, {} pruned, {} bytes".format(
+            self.hits, self.misses, self.stored, self.pruned, self.size())
+
+
+def parse_size(txt):
+
+    # '1000', '500k', '64M', '1G' -> bytes
+
+    mul = 1
+    t = txt.strip().lower()
+    for suffix, i in [('k', 2 ** 10), ('m', 2 ** 20), ('g', 2 ** 30)]:
+        if t.endswith(suffix):
+            mul = i
+            t = t[:-1]
+            break
+
+    try:
+        ret = int(t) * mul
+    except ValueError:
+        raise RuntimeError("invalid size value: {}".format(txt))
+
+    if ret < 0:
+        raise RuntimeError("invalid size value: {}".format(txt))
+
+    return ret
+
+
+def clock():
+    return time.perf_counter(), time.process_time()
+
+
+def add_clock(timings, name, start):
+
+    # adds wall and cpu time passed since start (as returned by clock()) to
+    # timings[name] = [wall, cpu]
+
+    wall, cpu = clock()
+    t = timings.setdefault(name, [0.0, 0.0])
+    t[0] += wall - start[0]
+    t[1] += cpu - start[1]
+
+
+def rss_peak(children=False):
+
+    # peak resident set size of this process (or of biggest of its finished
+    # child processes, like -j workers) in bytes, None if unknown
+
+    try:
+        import resource
+    except ImportError:
+        return None
+    who = resource.RUSAGE_SELF
+    if children:
+        who = resource.RUSAGE_CHILDREN
+    ret = resource.getrusage(who).ru_maxrss
+    if sys.platform != 'darwin':
+        ret *= 1024
+    return ret
+
+
+class Profiler:
+
+    # --profile: wall and cpu time of run stages and of each xml file, peak
+    # memory and written artifacts. with trace_memory, tracemalloc peak of
+    # each stage is recorded too (it slows down everything noticeably)
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.stages = []
+        self.files = dict()
+        self.artifacts = []
+        self.start = clock()
+        if trace_memory:
+            tracemalloc.start()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        timings = dict()
+        start = clock()
+        try:
+            yield
+        finally:
+            add_clock(timings, name, start)
+            record = {
+                'name': name,
+                'wall': timings[name][0],
+                'cpu': timings[name][1],
+                'rss_peak': rss_peak(),
+            }
+            if self.trace_memory:
+                record['tracemalloc_peak'] = tracemalloc.get_traced_memory()[1]
+            self.stages.append(record)
+
+    def add_file(self, name, timings):
+        # timings - dict of [wall, cpu] by step name, and 'bytes'
+        self.files[name] = timings
+
+    def add_artifact(self, writer):
+        record = {
+            'name': writer.output,
+            'bytes': writer.size,
+            'wall': writer.elapsed,
+            'write': writer.sinks[0][3],
+            'compressed': [],
+        }
+        for sink in writer.sinks[1:]:
+            record['compressed'].append({
+                'format': sink[0],
+                'name': sink[1],
+                'bytes': writer.sink_size(sink),
+                'wall': sink[3],
+            })
+        self.artifacts.append(record)
+
+    def report(self):
+
+        files = []
+        for name, timings in self.files.items():
+            record = {'name': name, 'bytes': timings.get('bytes', 0)}
+            wall = 0.0
+            cpu = 0.0
+            for k, v in timings.items():
+                if k == 'bytes':
+                    continue
+                record[k] = {'wall': v[0], 'cpu': v[1]}
+                wall += v[0]
+                cpu += v[1]
+            record['wall'] = wall
+            record['cpu'] = cpu
+            files.append(record)
+
+        files.sort(key=lambda x: x['wall'], reverse=True)
+
+        wall, cpu = clock()
+
+        ret = {
+            'wall': wall - self.start[0],
+            'cpu': cpu - self.start[1],
+            'rss_peak': rss_peak(),
+            'rss_peak_children': rss_peak(True),
+            'stages': self.stages,
+            'files': files,
+            'artifacts': self.artifacts,
+        }
+
+        if self.trace_memory:
+            ret['tracemalloc_peak'] = max(
+                [0] + [i['tracemalloc_peak'] for i in self.stages])
+
+        return ret
+
+    def write(self, filename, top=5):
+
+        report = self.report()
+
+        with open(filename, 'w') as f:
+            json.dump(report, f, indent=4)
+
+        print("profile: {:.3f}s wall, {:.3f}s cpu, peak rss {} bytes".format(
+            report['wall'], report['cpu'], report['rss_peak']))
+        for i in report['stages']:
+            print("  {:12} {:8.3f}s wall {:8.3f}s cpu".format(
+                i['name'], i['wall'], i['cpu']))
+        if len(report['files']) != 0:
+            print("  slowest files:")
+            for i in report['files'][:top]:
+                print("    {} {:.4f}s".format(i['name'], i['wall']))
+        print("profile report is saved to {}".format(filename))
+
+
+# Profiler, which gets statistics of every output file from open_artifact()
+ACTIVE_PROFILER = None
+
+
+def set_active_profiler(profiler):
+    global ACTIVE_PROFILER
+    ACTIVE_PROFILER = profiler
+
+
+def profile_stage(profiler, name):
+    if profiler is None:
+        return contextlib.nullcontext()
+    return profiler.stage(name)
+
+
+def finish_profiling(profiler, filename, c_profile, c_profile_filename):
+
+    if c_profile is not None:
+        c_profile.disable()
+        c_profile.dump_stats(c_profile_filename)
+        print("cProfile stats are saved to {}".format(c_profile_filename))
+
+    if profiler is not None:
+        set_active_profiler(None)
+        if profiler.trace_memory:
+            tracemalloc.stop()
+        profiler.write(filename)
+
+
+_XML_PARSER = None
+
+
+def get_xml_parser():
+
+    # one parser per process, reused for all files
+
+    global _XML_PARSER
+
+    if _XML_PARSER is None:
+        _XML_PARSER = lxml.etree.XMLParser()
+
+    return _XML_PARSER
+
+
+def sniff_xml_root_tag(filename):
+
+    # reads file only up to the start tag of the root element, without
+    # building the tree. returns None, if file can't be read that far
+
+    try:
+        with open(filename, 'rb') as f:
+            for event, element in lxml.etree.iterparse(f, events=('start',)):
+                return element.tag
+    except Exception:
+        pass
+
+    return None
+
+
+def parse_xml(filename, timings=None):
+
+    # timings - dict, to add wall and cpu time of parsing to (see
+    # add_clock()). lxml reads file itself, so reading is measured as part
+    # of parsing
 
     filename = os.path.abspath(filename)
 
@@ -621,17 +1720,17 @@ def parse_xml(filename):
     parsed = None
 
     try:
-        with open(filename, 'rb') as f:
-            txt = f.read()
-            parsed = lxml.etree.fromstring(txt)
+        start = clock()
+        parsed = lxml.etree.parse(filename, get_xml_parser()).getroot()
+        if timings is not None:
+            add_clock(timings, 'parse', start)
+            timings['bytes'] = os.path.getsize(filename)
     except Exception as e:
         print("can't open, read and/or parse file. error: {}".format(e))
         print("^^^^ skipping ^^^^: {}".format(filename))
         return None, None
 
-    protocol = parsed.xpath('/protocol')
-
-    if len(protocol) == 0:
+    if parsed.tag != 'protocol':
         return None, None
 
     parsed_info = dict()
@@ -643,156 +1742,217 @@ def parse_xml(filename):
     return key_name, parsed_info
 
 
-def find_all_xml_files(dirname):
+def find_all_xml_files(dirname, include=None, exclude=None, stats=None):
+
+    # include, exclude - lists of glob patterns, matched against paths
+    # relative to dirname. if include is given, only matching files are
+    # returned. excluded directories are not descended into
+
+    if include is None:
+        include = []
+
+    if exclude is None:
+        exclude = []
 
     ret = []
 
     dirname = os.path.abspath(dirname)
 
-    dirs_to_check = []
+    t0 = time.perf_counter()
+    dirs_scanned = 0
+    dirs_skipped = 0
+
+    dirs_to_check = collections.deque()
     dirs_to_check.append('.')
 
     while len(dirs_to_check) != 0:
-        d = dirs_to_check.pop(0)
+        d = dirs_to_check.popleft()
 
-        dirfiles = os.listdir(os.path.join(dirname, d))
+        try:
+            it = os.scandir(os.path.join(dirname, d))
+        except OSError as e:
+            print("can't scan directory {}. error: {}".format(d, e))
+            continue
 
-        for i in dirfiles:
+        dirs_scanned += 1
 
-            r_path = os.path.join(d, i)
-            a_path = os.path.join(dirname, r_path)
+        with it:
+            for i in it:
 
-            if os.path.isdir(a_path) and not os.path.islink(a_path):
-                dirs_to_check.append(r_path)
-                continue
+                r_path = os.path.join(d, i.name)
+                m_path = r_path[2:]
 
-            if os.path.isfile(a_path) and not os.path.islink(a_path):
-                if i.endswith('.xml'):
+                if i.is_dir(follow_symlinks=False):
+                    if skip_dir(i.name, m_path, exclude):
+                        dirs_skipped += 1
+                        continue
+                    dirs_to_check.append(r_path)
+                    continue
+
+                if i.is_file(follow_symlinks=False):
+                    if not i.name.endswith('.xml'):
+                        continue
+                    if _glob_match(m_path, exclude):
+                        continue
+                    if len(include) != 0 and not _glob_match(m_path, include):
+                        continue
                     ret.append(r_path)
-                continue
+                    continue
+
+    if stats is not None:
+        stats['scan_time'] = time.perf_counter() - t0
+        stats['dirs_scanned'] = dirs_scanned
+        stats['dirs_skipped'] = dirs_skipped
+        stats['files'] = len(ret)
 
     return ret
 
 
+def skip_dir(name, path, exclude):
+    return (
+        name.startswith('.')
+        or name in SKIP_DIRS
+        or _glob_match(path, exclude)
+    )
+
+
+def _glob_match(path, patterns):
+    for i in patterns:
+        if fnmatch.fnmatchcase(path, i):
+            return True
+    return False
+
+
 def generate_html_for_ProtocolCollection(protocol_collection, toc, super_toc):
 
     proto_collection_div = LBE.div('')
 
+    xref = protocol_collection.get_xref()
+
     for proto_file in protocol_collection.protocol_files:
+        proto_collection_div.append(
+            generate_html_for_ProtocolFile(proto_file, toc, super_toc, xref)
+        )
 
-        proto_file_div = LBE.div('')
-        proto_collection_div.append(proto_file_div)
+    return proto_collection_div
 
-        for protocol in proto_file.protocols:
 
-            idname_1 = protocol.name
-            super_idname_1 = 'superid-'+idname_1
+def generate_html_for_ProtocolFile(proto_file, toc, super_toc, xref=None):
 
-            toc.append(
-                LBE.div(
+    proto_file_div = LBE.div('')
+
+    for protocol in proto_file.protocols:
+
+        idname_1 = protocol.name
+        super_idname_1 = 'superid-'+idname_1
+
+        toc.append(
+            LBE.div(
+                {
+                    'class': 'level1',
+                    'id': super_idname_1
+                },
+                LBE.a(
                     {
-                        'class': 'level1',
-                        'id': super_idname_1
+                        'href': '#'+idname_1
                     },
-                    LBE.a(
-                        {
-                            'href': '#'+idname_1
-                        },
-                        'p: '+idname_1
-                    )
+                    'p: '+idname_1
                 )
             )
+        )
 
-            super_toc.append(
-                LBE.div(
+        super_toc.append(
+            LBE.div(
+                {
+                    'class': 'level1',
+                },
+                LBE.a(
                     {
-                        'class': 'level1',
+                        'href': '#'+super_idname_1
                     },
-                    LBE.a(
-                        {
-                            'href': '#'+super_idname_1
-                        },
-                        idname_1
-                    )
+                    idname_1
                 )
             )
+        )
 
-            protocol_div = lxml.etree.Element(
-                'div', {'id': idname_1, 'class': 'protocol-div'})
-            proto_file_div.append(protocol_div)
-            protocol_div_name = LBE.div('{}'.format(protocol.name), {
-                                        'class': 'protocol-name'})
-            protocol_div.append(protocol_div_name)
-            protocol_div.append(
-                LBE.div(
-                    "protocol file: {} ; dirname: {}".format(
-                        proto_file.basename,
-                        proto_file.dirname
-                    )
+        protocol_div = lxml.etree.Element(
+            'div', {'id': idname_1, 'class': 'protocol-div'})
+        proto_file_div.append(protocol_div)
+        protocol_div_name = LBE.div('{}'.format(protocol.name), {
+                                    'class': 'protocol-name'})
+        protocol_div.append(protocol_div_name)
+        protocol_div.append(
+            LBE.div(
+                "protocol file: {} ; dirname: {}".format(
+                    proto_file.basename,
+                    proto_file.dirname
                 )
             )
+        )
 
-            interfaces_div = lxml.etree.Element('div')
-            interfaces_div_txt = LBE.div(
-                '{} interface(s)'.format(len(protocol.interfaces)))
-            interfaces_div.append(interfaces_div_txt)
+        interfaces_div = lxml.etree.Element('div')
+        interfaces_div_txt = LBE.div(
+            '{} interface(s)'.format(len(protocol.interfaces)))
+        interfaces_div.append(interfaces_div_txt)
 
-            for interface in protocol.interfaces:
+        for interface in protocol.interfaces:
 
-                n = interface.name
-                idname_2 = idname_1 + '-'+n
+            n = interface.name
+            idname_2 = idname_1 + '-'+n
 
-                toc.append(LBE.div({'class': 'level2'}, LBE.a(
-                    {'href': '#'+idname_2}, 'i: '+n)))
+            toc.append(LBE.div({'class': 'level2'}, LBE.a(
+                {'href': '#'+idname_2}, 'i: '+n)))
 
-                interface_div = LBE.div(
-                    '', {'id': idname_2, 'class': 'interface-div'})
-                interface_div.append(
-                    LBE.div(
-                        'interface: ', LBE.b(interface.name, {
-                                             'class': "interface-name"}),
-                        ', version: ', LBE.b(interface.version),
-                        {"class": "interface-title"}
-                    )
+            interface_div = LBE.div(
+                '', {'id': idname_2, 'class': 'interface-div'})
+            interface_div.append(
+                LBE.div(
+                    'interface: ', LBE.b(interface.name, {
+                                         'class': "interface-name"}),
+                    ', version: ', LBE.b(interface.version),
+                    {"class": "interface-title"}
                 )
+            )
+
+            interface_div.append(
+                gen_descriptions_html(interface.descriptions))
 
+            if len(interface.requests) > 0:
                 interface_div.append(
-                    gen_descriptions_html(interface.descriptions))
-
-                if len(interface.requests) > 0:
-                    interface_div.append(
-                        gen_messages_html(
-                            interface.requests,
-                            toc,
-                            idname_2
-                        )
+                    gen_messages_html(
+                        interface.requests,
+                        toc,
+                        idname_2,
+                        xref=xref
                     )
+                )
 
-                if len(interface.events) > 0:
-                    interface_div.append(
-                        gen_messages_html(
-                            interface.events,
-                            toc,
-                            idname_2,
-                            mode='events'
-                        )
+            if len(interface.events) > 0:
+                interface_div.append(
+                    gen_messages_html(
+                        interface.events,
+                        toc,
+                        idname_2,
+                        mode='events',
+                        xref=xref
                     )
+                )
 
-                if len(interface.enums) > 0:
-                    interface_div.append(
-                        gen_messages_html(
-                            interface.enums,
-                            toc,
-                            idname_2,
-                            mode='enums'
-                        )
+            if len(interface.enums) > 0:
+                interface_div.append(
+                    gen_messages_html(
+                        interface.enums,
+                        toc,
+                        idname_2,
+                        mode='enums'
                     )
+                )
 
-                interfaces_div.append(interface_div)
+            interfaces_div.append(interface_div)
 
-            protocol_div.append(interfaces_div)
+        protocol_div.append(interfaces_div)
 
-    return proto_collection_div
+    return proto_file_div
 
 
 def generate_ProtocolCollection(parsed_docs):
@@ -809,78 +1969,259 @@ def generate_ProtocolCollection(parsed_docs):
     return ret
 
 
-def generate_ProtocolFile_for_parsed(parsed_info):
+def parse_and_generate_ProtocolFile(filename, profile=False):
 
-    protocol_file = ProtocolFile()
-    protocol_file.basename = parsed_info['basename']
-    protocol_file.dirname = parsed_info['dirname']
+    # runs in worker processes: both the lxml tree and the ProtocolFile are
+    # built here and only the (picklable) ProtocolFile is sent back. with
+    # profile, timings of parsing (with reading) and building are returned
+    # as third value
+
+    if not profile:
+        k, v = parse_xml(filename)
+        if k is None or v is None:
+            return None, None
+        return k, generate_ProtocolFile_for_parsed(v)
 
-    protocols = parsed_info['parsed'].xpath('/protocol')
+    timings = dict()
 
-    if len(protocols) == 0:
-        return None
+    k, v = parse_xml(filename, timings)
+    if k is None or v is None:
+        return None, None, timings
+
+    start = clock()
+    pf = generate_ProtocolFile_for_parsed(v)
+    add_clock(timings, 'build', start)
+
+    return k, pf, timings
 
-    for protocol in protocols:
 
-        prot_o = Protocol()
+def generate_ProtocolCollection_for_files(
+        cwd,
+        xml_files,
+        jobs=1,
+        cache=None,
+        stats=None,
+        profiler=None
+):
 
-        apply_common_fields_to_object_from_element(prot_o, protocol)
+    # each file is turned into ProtocolFile right after parsing and its lxml
+    # tree is dropped, so only one document (per worker) is in memory at a
+    # time. files with root element other than <protocol> are rejected
+    # before parsing. profiler gets timings of each file
 
-        # prot_o.status=parsed_info['status']
+    ret = ProtocolCollection()
+
+    ready = dict()
+
+    to_parse = []
+
+    sniff_time = 0.0
+    rejected = 0
+    rejected_bytes = 0
+
+    file_timings = dict()
+
+    for idx, i in enumerate(xml_files):
+        filename = os.path.join(cwd, i)
+
+        timings = dict()
+        file_timings[idx] = timings
+
+        if cache is not None:
+            start = clock()
+            found, k, pf = cache.get(filename)
+            add_clock(timings, 'cache', start)
+            if found:
+                ready[idx] = (k, pf)
+                continue
+
+        start = clock()
+        tag = sniff_xml_root_tag(filename)
+        add_clock(timings, 'sniff', start)
+        sniff_time += timings['sniff'][0]
+
+        if tag is not None and tag != 'protocol':
+            rejected += 1
+            rejected_bytes += os.path.getsize(filename)
+            ready[idx] = (None, None)
+            if cache is not None:
+                cache.put(filename, None, None)
+            continue
+
+        to_parse.append(idx)
+
+    filenames = [os.path.join(cwd, xml_files[idx]) for idx in to_parse]
+
+    parsed_bytes = 0
+    for i in filenames:
+        parsed_bytes += os.path.getsize(i)
+
+    parse_t0 = time.perf_counter()
+
+    with contextlib.ExitStack() as stack:
 
-        interfaces = protocol.xpath('interface')
+        if jobs > 1 and len(filenames) > 1:
 
-        for interface in interfaces:
+            executor = stack.enter_context(
+                concurrent.futures.ProcessPoolExecutor(max_workers=jobs)
+            )
+
+            # executor.map() keeps input order, so files are appended in
+            # the same order as in the serial path and sorting gives the
+            # same result
+            parsed = executor.map(
+                parse_and_generate_ProtocolFile,
+                filenames,
+                [profiler is not None] * len(filenames),
+                chunksize=max(1, len(filenames) // (jobs * 4))
+            )
+        else:
+            parsed = map(
+                parse_and_generate_ProtocolFile,
+                filenames,
+                [profiler is not None] * len(filenames)
+            )
+
+        parsed = iter(parsed)
+
+        for idx, i in enumerate(xml_files):
+
+            if idx in ready:
+                k, pf = ready.pop(idx)
+                if pf is not None:
+                    intern_ProtocolFile_symbols(pf)
+            else:
+                if profiler is None:
+                    k, pf = next(parsed)
+                else:
+                    k, pf, timings = next(parsed)
+                    file_timings[idx].update(timings)
+                if cache is not None:
+                    cache.put(os.path.join(cwd, i), k, pf)
+                if pf is not None and jobs > 1:
+                    intern_ProtocolFile_symbols(pf)
+
+            if profiler is not None:
+                profiler.add_file(os.path.normpath(i), file_timings[idx])
+
+            print(f"  {i}: ", end='')
+            if k is None or pf is None:
+                print("  fail")
+                continue
 
-            interf_o = Interface()
+            k_spl = k.split('/')
+            if 'tests' in k_spl:
+                print("  fail")
+                continue
 
-            apply_common_fields_to_object_from_element(interf_o, interface)
+            print("  ok")
+            ret.protocol_files.append(pf)
 
-            interf_o.version = interface.get('version', '0')
+    if stats is not None:
+        stats['sniff_time'] = sniff_time
+        stats['rejected'] = rejected
+        stats['rejected_bytes'] = rejected_bytes
+        stats['parsed'] = len(filenames)
+        stats['parsed_bytes'] = parsed_bytes
+        stats['parse_time'] = time.perf_counter() - parse_t0
 
-            interf_o.requests = []
-            interf_o.events = []
-            interf_o.enums = []
+    return ret
 
-            requests = interface.xpath('request')
-            for request in requests:
-                request_o = Request()
-                apply_common_fields_to_object_from_element(
-                    request_o, request)
-                apply_args_to_object(request_o, request)
-                interf_o.requests.append(request_o)
 
-            events = interface.xpath('event')
-            for event in events:
-                event_o = Event()
-                apply_common_fields_to_object_from_element(event_o, event)
-                apply_args_to_object(event_o, event)
-                interf_o.events.append(event_o)
+def generate_ProtocolFile_for_parsed(parsed_info):
 
-            enums = interface.xpath('enum')
-            for enum in enums:
-                enum_o = Enum()
+    protocol_file = ProtocolFile()
+    protocol_file.basename = parsed_info['basename']
+    protocol_file.dirname = parsed_info['dirname']
 
-                apply_common_fields_to_object_from_element(enum_o, enum)
+    protocol = parsed_info['parsed']
 
-                entrys = enum.xpath('entry')
-                for entry in entrys:
-                    entry_o = Entry()
-                    entry_o.name = entry.get('name', '')
-                    entry_o.value = entry.get('value', '')
-                    entry_o.summary = entry.get('summary', '')
+    if protocol.tag != 'protocol':
+        return None
 
-                    enum_o.entries.append(entry_o)
+    prot_o = Protocol()
 
-                interf_o.enums.append(enum_o)
+    apply_element_to_object(prot_o, protocol, PROTOCOL_CHILD_HANDLERS)
 
-            prot_o.interfaces.append(interf_o)
+    # prot_o.status=parsed_info['status']
 
-        protocol_file.protocols.append(prot_o)
+    protocol_file.protocols.append(prot_o)
 
     return protocol_file
 
 
+class OutputFragments:
+
+    # watch mode: generated text of each protocol file for one target, so
+    # after changes only parts of re-parsed files are generated again.
+    # parts are [protocol file, key, part] by id() of protocol file (it is
+    # kept, so id can't be reused). key - value, besides protocol file, part
+    # depends on (like page name and link targets). names - file names
+    # written last time. subs - other parts of the same protocol files
+    # (search index docs of html targets), by name. generated and reused
+    # count protocol files since reset_stats(), each file once, however many
+    # times its part is taken
+
+    def __init__(self):
+        self.parts = dict()
+        self.names = []
+        self.subs = dict()
+        self.counted = set()
+        self.generated = 0
+        self.reused = 0
+
+    def get(self, protocol_file, make, key=None):
+        counted = id(protocol_file) in self.counted
+        self.counted.add(id(protocol_file))
+        part = self.parts.get(id(protocol_file))
+        if (part is not None
+                and part[0] is protocol_file
+                and part[1] == key):
+            if not counted:
+                self.reused += 1
+            return part[2]
+        if not counted:
+            self.generated += 1
+        part = [protocol_file, key, make(protocol_file)]
+        self.parts[id(protocol_file)] = part
+        return part[2]
+
+    def retain(self, protocol_files):
+        # drops parts of protocol files, which are not in collection
+        ids = set(id(i) for i in protocol_files)
+        for i in list(self.parts):
+            if i not in ids:
+                del self.parts[i]
+        for i in self.subs.values():
+            i.retain(protocol_files)
+
+    def reset_stats(self):
+        self.counted = set()
+        self.generated = 0
+        self.reused = 0
+        for i in self.subs.values():
+            i.reset_stats()
+
+    def sub(self, name):
+        ret = self.subs.get(name)
+        if ret is None:
+            ret = OutputFragments()
+            self.subs[name] = ret
+        return ret
+
+
+def get_fragment(fragments, protocol_file, make, key=None):
+    if fragments is None:
+        return make(protocol_file)
+    return fragments.get(protocol_file, make, key)
+
+
+def sub_fragments(fragments, name):
+    if fragments is None:
+        return None
+    return fragments.sub(name)
+
+
 def generate_simple_struct(list_of_Protocols):
 
     # note: here are intentionally used list of tuples and not OrderedDict.
@@ -889,93 +2230,121 @@ def generate_simple_struct(list_of_Protocols):
     proto_od = []
 
     for protocol_file in list_of_Protocols.protocol_files:
+        proto_od.append(
+            ['protocol_file', protocol_file_simple_struct(protocol_file)]
+        )
+
+    return proto_od
 
-        proto_file_tuple_list = []
-        proto_od.append(['protocol_file', proto_file_tuple_list])
 
-        proto_file_tuple_list.append(['basename', protocol_file.basename])
-        proto_file_tuple_list.append(['dirname', protocol_file.dirname])
+def protocol_file_simple_struct(protocol_file):
 
-        protos_tuple_list = []
-        proto_file_tuple_list.append(['protocols', protos_tuple_list])
+    proto_file_tuple_list = []
+    proto_file_tuple_list.append(['basename', protocol_file.basename])
+    proto_file_tuple_list.append(['dirname', protocol_file.dirname])
 
-        for protocol in protocol_file.protocols:
+    protos_tuple_list = []
+    proto_file_tuple_list.append(['protocols', protos_tuple_list])
 
-            proto_tuple_list = []
-            protos_tuple_list.append(proto_tuple_list)
+    for protocol in protocol_file.protocols:
 
-            common_fields_from_obj_to_simple_struct(proto_tuple_list, protocol)
+        proto_tuple_list = []
+        protos_tuple_list.append(proto_tuple_list)
 
-            # proto_tuple_list.append(['status', protocol.status])
+        common_fields_from_obj_to_simple_struct(proto_tuple_list, protocol)
 
-            interfs_tuple_list = []
-            proto_tuple_list.append(['interfaces', interfs_tuple_list])
+        # proto_tuple_list.append(['status', protocol.status])
 
-            for interface in protocol.interfaces:
+        interfs_tuple_list = []
+        proto_tuple_list.append(['interfaces', interfs_tuple_list])
+
+        for interface in protocol.interfaces:
+
+            interf_tuple_list = []
+            common_fields_from_obj_to_simple_struct(
+                interf_tuple_list, interface)
+
+            interf_tuple_list.append(['version', interface.version])
+
+            # work with requests
+
+            reqs_tuple_list = []
+            interf_tuple_list.append(['requests', reqs_tuple_list])
 
-                interf_tuple_list = []
+            for request in interface.requests:
+
+                req_tuple_list = []
                 common_fields_from_obj_to_simple_struct(
-                    interf_tuple_list, interface)
+                    req_tuple_list, request)
 
-                interf_tuple_list.append(['version', interface.version])
+                req_tuple_list.append(
+                    ['args', arguments_simple_struct(request)])
 
-                # work with requests
+                reqs_tuple_list.append(req_tuple_list)
 
-                reqs_tuple_list = []
-                interf_tuple_list.append(['requests', reqs_tuple_list])
+            # work with events
 
-                for request in interface.requests:
+            eves_tuple_list = []
+            interf_tuple_list.append(['events', eves_tuple_list])
 
-                    req_tuple_list = []
-                    common_fields_from_obj_to_simple_struct(
-                        req_tuple_list, request)
+            for event in interface.events:
 
-                    req_tuple_list.append(
-                        ['args', arguments_simple_struct(request)])
+                eve_tuple_list = []
+                common_fields_from_obj_to_simple_struct(
+                    eve_tuple_list, event)
 
-                    reqs_tuple_list.append(req_tuple_list)
+                eve_tuple_list.append(
+                    ['args', arguments_simple_struct(event)])
 
-                # work with events
+                eves_tuple_list.append(eve_tuple_list)
 
-                eves_tuple_list = []
-                interf_tuple_list.append(['events', eves_tuple_list])
+            # work with enums
 
-                for event in interface.events:
+            enus_tuple_list = []
+            interf_tuple_list.append(['enums', enus_tuple_list])
 
-                    eve_tuple_list = []
-                    common_fields_from_obj_to_simple_struct(
-                        eve_tuple_list, event)
+            for enum in interface.enums:
 
-                    eve_tuple_list.append(
-                        ['args', arguments_simple_struct(event)])
+                enu_tuple_list = []
+                common_fields_from_obj_to_simple_struct(
+                    enu_tuple_list, enum)
 
-                    eves_tuple_list.append(eve_tuple_list)
+                enu_tuple_list.append(
+                    ['entries', entries_simple_struct(enum)])
 
-                # work with enums
+                enus_tuple_list.append(enu_tuple_list)
 
-                enus_tuple_list = []
-                interf_tuple_list.append(['enums', enus_tuple_list])
+            # end of works
 
-                for enum in interface.enums:
+            interfs_tuple_list.append(interf_tuple_list)
 
-                    enu_tuple_list = []
-                    common_fields_from_obj_to_simple_struct(
-                        enu_tuple_list, enum)
+    return proto_file_tuple_list
 
-                    enu_tuple_list.append(
-                        ['entries', entries_simple_struct(enum)])
 
-                    enus_tuple_list.append(enu_tuple_list)
+# emitter of yaml targets. see set_yaml_dumper()
+YAML_DUMPER = yaml.Dumper
 
-                # end of works
 
-                interfs_tuple_list.append(interf_tuple_list)
+def set_yaml_dumper(fast):
 
-    return proto_od
+    # libyaml emitter (yaml.CDumper) is several times faster than pure
+    # python one. it makes the same data, but wraps long strings at other
+    # places, so it's used only if asked. pyyaml can be built without
+    # libyaml, python emitter is used then
+
+    global YAML_DUMPER
+    YAML_DUMPER = yaml.Dumper
+    if fast:
+        dumper = getattr(yaml, 'CDumper', None)
+        if dumper is None:
+            print("libyaml is not available. using python yaml emitter")
+        else:
+            YAML_DUMPER = dumper
+    return YAML_DUMPER
 
 
 def generate_yaml(simple_struct):
-    ret = yaml.dump(simple_struct, Dumper=yaml.Dumper)
+    ret = yaml.dump(simple_struct, Dumper=YAML_DUMPER)
     return ret
 
 
@@ -984,143 +2353,2595 @@ def generate_json(simple_struct):
     return ret
 
 
-def generate_html(obj_tree):
+def yaml_protocol_file_text(protocol_file, struct=None):
+    # struct - protocol_file_simple_struct(protocol_file), if it's ready
+    if struct is None:
+        struct = protocol_file_simple_struct(protocol_file)
+    return yaml.dump([['protocol_file', struct]], Dumper=YAML_DUMPER)
 
-    # stable, staging, unstable = stable_unstable_sort(parsed_docs)
 
-    # sorted_proto_name_list = gen_sorted_proto_name_list(parsed_docs)
+def yaml_protocol_file_document(protocol_file, struct=None):
+    # struct - protocol_file_simple_struct(protocol_file), if it's ready
+    if struct is None:
+        struct = protocol_file_simple_struct(protocol_file)
+    return yaml.dump(
+        ['protocol_file', struct],
+        Dumper=YAML_DUMPER,
+        explicit_start=True
+    )
 
-    texts = ''
 
-    body = lxml.etree.Element('body')
-    main_div = LBE.div('', {'id': 'main-div'})
-    toc = LBE.div('', {'id': 'toc-div'})
-    super_toc = LBE.div('', {'id': 'supertoc-div'})
-    body.append(super_toc)
-    body.append(toc)
-    body.append(main_div)
+class LastSimpleStruct:
 
-    main_div.append(
-        generate_html_for_ProtocolCollection(obj_tree, toc, super_toc)
-    )
+    # simple struct of the last asked protocol file. yaml and json targets
+    # of one walk (see write_walk_targets()) share it, so it's made once
+    # per protocol file and only one is kept
 
-    html_struct = LBE.html(
-        LBE.head(
-            LBE.title("Wayland Protocols Documentation"),
-            LBE.style('''
-            body { font-size: 10px; font-family: "Go Mono"; margin: 0; padding: 0;}
-            #main-div {
-                position: absolute;
-                left: 210px;
-                right: 210px;
-                top: 0px;
-                bottom: 0px;
-                overflow: scroll;
-                padding-left: 20px;
-                padding-right: 20px;
-                }
-            #main-div table { font-size: 10px; font-family: "Go Mono"; }
-            #main-div div {  }
-            #supertoc-div {
-                   position: fixed;
-                   top: 0px; left: 0px; bottom: 0px; width: 200px;
-                   overflow: scroll; padding-top: 20px; padding-bottom: 20px;
-                   text-wrap: nowrap;white-space: nowrap;
-                   border: 5px black dotted;
-                }
-            #toc-div {
-                   position: fixed;
-                   top: 0px; right: 0px; bottom: 0px; width: 200px;
-                   overflow: scroll; padding-top: 20px; padding-bottom: 20px;
-                   text-wrap: nowrap;white-space: nowrap;
-                   border: 5px black dotted;
-                }
-            #toc-div .level1 {margin-left: 0px; margin-top: 10px; }
-            #toc-div .level2 {margin-left: 10px; margin-top: 5px;  }
-            #toc-div .level3 {margin-left: 20px; }
-            #toc-div .level1 a {color: red;}
-            #toc-div .level2 a {color: teal;}
-            #toc-div .level3 a {color: maroon;}
-            .protocol-name {
-               font-size: 20px;
-               border: 3px solid black;
-               border-radius: 5px;
-               padding: 5px;
-               margin: 0 !important;
-            }
-            .protocol-div div {margin-left: 10px;}
-            .interface-name {color: green;}
-            .request-name, .event-name, .enum-name {color: maroon; font-size: 13px;}
-            .requests-div, .events-div, .enums-div {border: 2px solid silver; box-shadow: 2px 2px 0px gold; padding-bottom: 10px; margin-bottom: 5px;}
-            .interface-title { color: blue; }
-            .interface-div { margin-bottom: 5px; border: 1px gray dotted; padding: 5px; border-radius: 5px;}
-            .description-div { color: grey; padding: 2px; padding-left: 20px; padding-right: 20px; border: 1px grey dotted; text-align: justify; margin-left: 20px; margin-bottom:5px;}
-            .args-table { margin-left: 20px; /* width: 100%; */ }
-            .args-table td { padding-left: 10px; padding-right: 10px; border: 1px gray solid; box-shadow: 2px 2px 0px teal;}
-            .args-table th { text-align: left; }
-            .arg-name { }
+    def __init__(self):
+        self.protocol_file = None
+        self.struct = None
+
+    def __call__(self, protocol_file):
+        if self.protocol_file is not protocol_file:
+            self.struct = protocol_file_simple_struct(protocol_file)
+            self.protocol_file = protocol_file
+        return self.struct
+
+
+def generate_yaml_stream(obj_tree, f, fragments=None):
+    for i in yaml_stream_steps(obj_tree, f, fragments):
+        pass
+
+
+def yaml_stream_steps(
+        obj_tree,
+        f,
+        fragments=None,
+        struct_of=protocol_file_simple_struct
+):
+
+    # same text as generate_yaml(generate_simple_struct(obj_tree)): block
+    # sequence items are independent, so each protocol file is dumped as
+    # one-item sequence and only its simple struct is kept in memory.
+    # yields after each protocol file. struct_of - function, which makes
+    # simple struct of protocol file
+
+    if len(obj_tree.protocol_files) == 0:
+        f.write(generate_yaml([]))
+        return
+
+    def make(protocol_file):
+        return yaml_protocol_file_text(protocol_file, struct_of(protocol_file))
+
+    for protocol_file in obj_tree.protocol_files:
+        f.write(get_fragment(fragments, protocol_file, make))
+        yield
+
+
+def generate_yaml_documents_stream(obj_tree, f, fragments=None):
+    for i in yaml_documents_stream_steps(obj_tree, f, fragments):
+        pass
+
+
+def yaml_documents_stream_steps(
+        obj_tree,
+        f,
+        fragments=None,
+        struct_of=protocol_file_simple_struct
+):
+
+    # yaml stream with document per protocol file. each document is the
+    # same ['protocol_file', ...] pair, as items of yaml target's list, so
+    # files can be read one by one with yaml.load_all() (or
+    # yaml.safe_load_all()). stream without protocol files is empty.
+    # yields after each protocol file
+
+    def make(protocol_file):
+        return yaml_protocol_file_document(
+            protocol_file, struct_of(protocol_file))
+
+    for protocol_file in obj_tree.protocol_files:
+        f.write(get_fragment(fragments, protocol_file, make))
+        yield
+
+
+def write_json_simple_struct(out, obj, level):
+
+    # appends to 'out' list the same text, as json.dumps(obj, indent=4)
+    # makes for simple struct at given nesting level. encoded symbols are
+    # taken from SYMBOLS cache
+
+    if type(obj) is str:
+        if SYMBOLS.is_symbol(obj):
+            out.append(SYMBOLS.json(obj))
+        else:
+            out.append(json.encoder.encode_basestring_ascii(obj))
+        return
+
+    if len(obj) == 0:
+        out.append('[]')
+        return
+
+    sep = '\n' + '    ' * (level + 1)
+
+    out.append('[')
+    first = True
+    for i in obj:
+        if first:
+            out.append(sep)
+            first = False
+        else:
+            out.append(',' + sep)
+        write_json_simple_struct(out, i, level + 1)
+    out.append('\n' + '    ' * level + ']')
+
+
+def json_protocol_file_text(protocol_file, struct=None):
+    # struct - protocol_file_simple_struct(protocol_file), if it's ready
+    if struct is None:
+        struct = protocol_file_simple_struct(protocol_file)
+    out = []
+    write_json_simple_struct(out, ['protocol_file', struct], 1)
+    return ''.join(out)
+
+
+def generate_json_stream(obj_tree, f, fragments=None):
+    for i in json_stream_steps(obj_tree, f, fragments):
+        pass
+
+
+def json_stream_steps(
+        obj_tree,
+        f,
+        fragments=None,
+        struct_of=protocol_file_simple_struct
+):
+
+    # same text as generate_json(generate_simple_struct(obj_tree)). yields
+    # after each protocol file
+
+    if len(obj_tree.protocol_files) == 0:
+        f.write(generate_json([]))
+        return
+
+    def make(protocol_file):
+        return json_protocol_file_text(protocol_file, struct_of(protocol_file))
+
+    f.write('[')
+
+    first = True
+    for protocol_file in obj_tree.protocol_files:
+        if not first:
+            f.write(',')
+        first = False
+        f.write('\n    ')
+        f.write(get_fragment(fragments, protocol_file, make))
+        yield
+
+    f.write('\n]')
+
+
+class BinaryWriter:
+
+    def __init__(self):
+        self.strings = {'': 0}
+        self.string_offsets = array.array('I', [0, 0])
+        self.string_data = array.array('B')
+        self.records = dict()
+        for i in BINARY_RECORDS:
+            self.records[i] = array.array('I')
+
+    def string(self, value):
+        ret = self.strings.get(value)
+        if ret is None:
+            ret = len(self.string_offsets) - 1
+            self.strings[value] = ret
+            self.string_data.frombytes(value.encode('utf-8'))
+            self.string_offsets.append(len(self.string_data))
+        return ret
+
+    def count(self, section):
+        return len(self.records[section]) // len(BINARY_RECORDS[section])
+
+    def add(self, section, *fields):
+        self.records[section].extend(fields)
+
+    def add_descriptions(self, obj):
+
+        # returns (first, count)
+
+        ret = (self.count('descriptions'), len(obj.descriptions))
+        for i in obj.descriptions:
+            self.add(
+                'descriptions',
+                self.string(i.summary),
+                self.string(i.text)
+            )
+        return ret
+
+    def add_messages(self, messages):
+        for message in messages:
+            self.add(
+                'messages',
+                self.string(message.name),
+                *self.add_descriptions(message),
+                self.count('args'),
+                len(message.arguments)
+            )
+            for arg in message.arguments:
+                self.add(
+                    'args',
+                    self.string(arg.name),
+                    self.string(arg.type_),
+                    self.string(arg.interface),
+                    self.string(arg.enum),
+                    self.string(arg.summary)
+                )
+
+    def add_interface(self, interface):
+        self.add(
+            'interfaces',
+            self.string(interface.name),
+            self.string(interface.version),
+            *self.add_descriptions(interface),
+            self.count('messages'),
+            len(interface.requests),
+            len(interface.events),
+            self.count('enums'),
+            len(interface.enums)
+        )
+        self.add_messages(interface.requests)
+        self.add_messages(interface.events)
+        for enum in interface.enums:
+            self.add(
+                'enums',
+                self.string(enum.name),
+                *self.add_descriptions(enum),
+                self.count('entries'),
+                len(enum.entries)
+            )
+            for entry in enum.entries:
+                self.add(
+                    'entries',
+                    self.string(entry.name),
+                    self.string(entry.value),
+                    self.string(entry.summary)
+                )
+
+    def add_protocol_file(self, protocol_file):
+
+        # children are added right after their parent record, so each
+        # section gets them in one run
+
+        self.add(
+            'protocol_files',
+            self.string(protocol_file.basename),
+            self.string(protocol_file.dirname),
+            self.count('protocols'),
+            len(protocol_file.protocols)
+        )
+        for protocol in protocol_file.protocols:
+            self.add(
+                'protocols',
+                self.string(protocol.name),
+                *self.add_descriptions(protocol),
+                self.count('interfaces'),
+                len(protocol.interfaces)
+            )
+            for interface in protocol.interfaces:
+                self.add_interface(interface)
+
+    def interface_names(self):
+        fields = len(BINARY_RECORDS['interfaces'])
+        names = self.records['interfaces'][::fields]
+        strings = list(self.strings)
+        return array.array(
+            'I',
+            sorted(range(len(names)), key=lambda i: strings[names[i]])
+        )
+
+    def write(self, f):
+
+        # returns written size
+
+        sections = [self.string_offsets, self.string_data]
+        for i in BINARY_RECORDS:
+            sections.append(self.records[i])
+        sections.append(self.interface_names())
+
+        header = [BINARY_MAGIC, BINARY_VERSION]
+        offset = BINARY_HEADER.size
+        for name, data in zip(BINARY_SECTIONS, sections):
+            if name == 'strings':
+                count = len(data) - 1
+            elif name in BINARY_RECORDS:
+                count = len(data) // len(BINARY_RECORDS[name])
+            else:
+                count = len(data)
+            header += [offset, count]
+            offset += len(data) * data.itemsize
+            # records are aligned for uint32 access
+            offset += -offset % 4
+
+        f.write(BINARY_HEADER.pack(*header))
+
+        size = BINARY_HEADER.size
+        for data in sections:
+            if sys.byteorder != 'little' and data.itemsize != 1:
+                data = array.array(data.typecode, data)
+                data.byteswap()
+            f.write(memoryview(data).cast('B'))
+            size += len(data) * data.itemsize
+            if size % 4 != 0:
+                f.write(b'\0' * (-size % 4))
+                size += -size % 4
+
+        return size
+
+
+def generate_binary_stream(obj_tree, f):
+    writer = BinaryWriter()
+    for protocol_file in obj_tree.protocol_files:
+        writer.add_protocol_file(protocol_file)
+    return writer.write(f)
+
+
+# sqlite target schema. each table keeps order of its rows among siblings
+# in 'position'. descriptions belong to protocols, interfaces, messages or
+# enums: owner_kind is name of owner's table. 'search' is fts5 table with
+# row per protocol, interface, message, enum, arg and entry: name is full
+# dotted name and summary and text are joined from all its descriptions
+
+SQLITE_SCHEMA = [
+    '''create table protocol_files (
+        id integer primary key,
+        basename text not null,
+        dirname text not null,
+        stability text not null
+    )''',
+    '''create table protocols (
+        id integer primary key,
+        protocol_file_id integer not null references protocol_files(id),
+        position integer not null,
+        name text not null
+    )''',
+    '''create table interfaces (
+        id integer primary key,
+        protocol_id integer not null references protocols(id),
+        position integer not null,
+        name text not null,
+        version integer not null
+    )''',
+    '''create table messages (
+        id integer primary key,
+        interface_id integer not null references interfaces(id),
+        kind text not null check (kind in ('request', 'event')),
+        position integer not null,
+        name text not null
+    )''',
+    '''create table args (
+        id integer primary key,
+        message_id integer not null references messages(id),
+        position integer not null,
+        name text not null,
+        type text not null,
+        interface text not null,
+        enum text not null,
+        summary text not null
+    )''',
+    '''create table enums (
+        id integer primary key,
+        interface_id integer not null references interfaces(id),
+        position integer not null,
+        name text not null
+    )''',
+    '''create table entries (
+        id integer primary key,
+        enum_id integer not null references enums(id),
+        position integer not null,
+        name text not null,
+        value text not null,
+        summary text not null
+    )''',
+    '''create table descriptions (
+        id integer primary key,
+        owner_kind text not null,
+        owner_id integer not null,
+        position integer not null,
+        summary text not null,
+        text text not null
+    )''',
+    '''create virtual table search using fts5(
+        kind unindexed,
+        ref_id unindexed,
+        name,
+        summary,
+        text
+    )''',
+]
+
+# made after rows are inserted, which is faster than keeping them up to
+# date while inserting
+SQLITE_INDEXES = [
+    'create index protocols_protocol_file_id on protocols(protocol_file_id)',
+    'create index protocols_name on protocols(name)',
+    'create index interfaces_protocol_id on interfaces(protocol_id)',
+    'create index interfaces_name on interfaces(name)',
+    'create index interfaces_version on interfaces(version)',
+    'create index messages_interface_id on messages(interface_id, kind)',
+    'create index messages_name on messages(name)',
+    'create index args_message_id on args(message_id)',
+    'create index args_type on args(type)',
+    'create index args_interface on args(interface)',
+    'create index enums_interface_id on enums(interface_id)',
+    'create index enums_name on enums(name)',
+    'create index entries_enum_id on entries(enum_id)',
+    'create index descriptions_owner on descriptions(owner_kind, owner_id)',
+]
+
+SQLITE_INSERTS = collections.OrderedDict([
+    ('protocol_files', 4),
+    ('protocols', 4),
+    ('interfaces', 5),
+    ('messages', 5),
+    ('args', 8),
+    ('enums', 4),
+    ('entries', 6),
+    ('descriptions', 6),
+    ('search', 6),
+])
+
+
+class SqliteRows:
+
+    # rows of all tables, made in one walk of the tree. ids are assigned
+    # here, as numbers of rows in their tables, starting from 1
+
+    def __init__(self):
+        self.tables = dict()
+        for i in SQLITE_INSERTS:
+            self.tables[i] = []
+
+    def add(self, table, *row):
+        rows = self.tables[table]
+        rows.append((len(rows) + 1,) + row)
+        return len(rows)
+
+    def add_described(self, table, kind, full_name, obj, *row):
+
+        # adds row of object with descriptions and its search row
+
+        ret = self.add(table, *row)
+
+        summaries = []
+        texts = []
+        for i, description in enumerate(obj.descriptions):
+            self.add(
+                'descriptions',
+                table,
+                ret,
+                i,
+                description.summary,
+                description.text
+            )
+            summaries.append(description.summary)
+            texts.append(description.text)
+
+        self.add(
+            'search',
+            kind,
+            ret,
+            full_name,
+            '\n'.join(summaries),
+            '\n'.join(texts)
+        )
+
+        return ret
+
+    def add_messages(self, interface_id, interface_name, kind, messages):
+        for i, message in enumerate(messages):
+            full_name = interface_name + '.' + message.name
+            message_id = self.add_described(
+                'messages',
+                kind,
+                full_name,
+                message,
+                interface_id,
+                kind,
+                i,
+                message.name
+            )
+            for j, arg in enumerate(message.arguments):
+                arg_id = self.add(
+                    'args',
+                    message_id,
+                    j,
+                    arg.name,
+                    arg.type_,
+                    arg.interface,
+                    arg.enum,
+                    arg.summary
+                )
+                self.add(
+                    'search',
+                    'arg',
+                    arg_id,
+                    full_name + '.' + arg.name,
+                    arg.summary,
+                    ''
+                )
+
+    def add_interface(self, protocol_id, position, interface):
+        interface_id = self.add_described(
+            'interfaces',
+            'interface',
+            interface.name,
+            interface,
+            protocol_id,
+            position,
+            interface.name,
+            interface.version
+        )
+        self.add_messages(
+            interface_id, interface.name, 'request', interface.requests)
+        self.add_messages(
+            interface_id, interface.name, 'event', interface.events)
+        for i, enum in enumerate(interface.enums):
+            full_name = interface.name + '.' + enum.name
+            enum_id = self.add_described(
+                'enums',
+                'enum',
+                full_name,
+                enum,
+                interface_id,
+                i,
+                enum.name
+            )
+            for j, entry in enumerate(enum.entries):
+                entry_id = self.add(
+                    'entries',
+                    enum_id,
+                    j,
+                    entry.name,
+                    entry.value,
+                    entry.summary
+                )
+                self.add(
+                    'search',
+                    'entry',
+                    entry_id,
+                    full_name + '.' + entry.name,
+                    entry.summary,
+                    ''
+                )
+
+    def add_protocol_file(self, protocol_file):
+        stability = protocol_file.stability
+        if stability is None:
+            stability = protocol_file.calc_stability()
+        protocol_file_id = self.add(
+            'protocol_files',
+            protocol_file.basename,
+            protocol_file.dirname,
+            stability
+        )
+        for i, protocol in enumerate(protocol_file.protocols):
+            protocol_id = self.add_described(
+                'protocols',
+                'protocol',
+                protocol.name,
+                protocol,
+                protocol_file_id,
+                i,
+                protocol.name
+            )
+            for j, interface in enumerate(protocol.interfaces):
+                self.add_interface(protocol_id, j, interface)
+
+
+def generate_sqlite(obj_tree, filename):
+
+    # writes new database into filename, which must not exist. all rows are
+    # inserted with executemany() in one transaction, indexes are made after
+    # them. database is written only once, so journal is not needed
+
+    rows = SqliteRows()
+    for protocol_file in obj_tree.protocol_files:
+        rows.add_protocol_file(protocol_file)
+
+    conn = sqlite3.connect(filename, isolation_level=None)
+    try:
+        conn.execute('pragma journal_mode = off')
+        conn.execute('pragma synchronous = off')
+        conn.execute('begin')
+        for i in SQLITE_SCHEMA:
+            conn.execute(i)
+        for table, columns in SQLITE_INSERTS.items():
+            names = ''
+            if table == 'search':
+                # fts5 table has rowid instead of id column
+                names = ' (rowid, kind, ref_id, name, summary, text)'
+            conn.executemany(
+                'insert into {}{} values ({})'.format(
+                    table, names, ', '.join(['?'] * columns)),
+                rows.tables[table]
+            )
+        for i in SQLITE_INDEXES:
+            conn.execute(i)
+        conn.execute('commit')
+    finally:
+        conn.close()
+
+    ret = dict()
+    for table, table_rows in rows.tables.items():
+        ret[table] = len(table_rows)
+    return ret
+
+
+def gen_html_head(title="Wayland Protocols Documentation", stylesheet=None):
+
+    # stylesheet - href of css file to link instead of inline HTML_STYLE
+
+    if stylesheet is not None:
+        return LBE.head(
+            LBE.title(title),
+            LBE.link({'rel': 'stylesheet', 'href': stylesheet}),
+        )
+
+    return LBE.head(
+        LBE.title(title),
+        LBE.style(HTML_STYLE),
+    )
+
+
+def generate_html(obj_tree):
+
+    # stable, staging, unstable = stable_unstable_sort(parsed_docs)
+
+    # sorted_proto_name_list = gen_sorted_proto_name_list(parsed_docs)
+
+    texts = ''
+
+    body = lxml.etree.Element('body')
+    main_div = LBE.div('', {'id': 'main-div'})
+    toc = LBE.div('', {'id': 'toc-div'})
+    super_toc = LBE.div('', {'id': 'supertoc-div'})
+    body.append(super_toc)
+    body.append(toc)
+    body.append(main_div)
+
+    main_div.append(
+        generate_html_for_ProtocolCollection(obj_tree, toc, super_toc)
+    )
+
+    html_struct = LBE.html(
+        gen_html_head(),
+        body
+    )
+
+    ret = lxml.etree.tostring(
+        html_struct,
+        pretty_print=True,
+        method='html'
+    )
+
+    return ret
+
+
+class HtmlChunkList:
+
+    # stand-in for toc divs in streaming mode: keeps serialized toc lines
+    # instead of lxml elements
+
+    def __init__(self):
+        self.chunks = []
+
+    def append(self, element):
+        self.chunks.append(
+            lxml.etree.tostring(element, pretty_print=True, method='html')
+        )
+
+
+def html_start_end_tags(element):
+
+    # tags, as html serializer outputs them around element's children
+
+    txt = lxml.etree.tostring(element, pretty_print=True, method='html')
+    i = txt.rindex('</{}>'.format(element.tag).encode('utf-8'))
+    return txt[:i], txt[i:]
+
+
+def html_links_key(proto_file, xref):
+
+    # interface link targets, html of protocol file depends on
+
+    ret = []
+    for protocol in proto_file.protocols:
+        for interface in protocol.interfaces:
+            for message in interface.requests + interface.events:
+                for arg in message.arguments:
+                    ret.append(xref.interface_href(arg.interface))
+    return tuple(ret)
+
+
+def html_protocol_file_parts(proto_file, xref):
+
+    # serialized main div part, toc lines and super toc lines of protocol
+    # file
+
+    toc = HtmlChunkList()
+    super_toc = HtmlChunkList()
+
+    main_txt = lxml.etree.tostring(
+        generate_html_for_ProtocolFile(proto_file, toc, super_toc, xref),
+        pretty_print=True,
+        method='html'
+    )
+
+    return main_txt, toc.chunks, super_toc.chunks
+
+
+def generate_html_stream(obj_tree, f, fragments=None):
+    for i in html_stream_steps(obj_tree, f, fragments):
+        pass
+
+
+def html_stream_steps(obj_tree, f, fragments=None):
+
+    # same bytes as generate_html(), but only one protocol file is kept as
+    # lxml tree at a time. tocs go before main div in the document, so main
+    # div is spooled into temporary file, until tocs are complete. yields
+    # after each protocol file
+
+    toc = HtmlChunkList()
+    super_toc = HtmlChunkList()
+    xref = obj_tree.get_xref()
+
+    def make(proto_file):
+        return html_protocol_file_parts(proto_file, xref)
+
+    with tempfile.TemporaryFile() as main_f:
+
+        for proto_file in obj_tree.protocol_files:
+            key = None
+            if fragments is not None:
+                key = html_links_key(proto_file, xref)
+            main_txt, toc_chunks, super_toc_chunks = get_fragment(
+                fragments,
+                proto_file,
+                make,
+                key
+            )
+            main_f.write(main_txt)
+            toc.chunks += toc_chunks
+            super_toc.chunks += super_toc_chunks
+            yield
+
+        f.write(b'<html>\n')
+        f.write(
+            lxml.etree.tostring(gen_html_head(), pretty_print=True, method='html')
+        )
+        f.write(b'<body>\n')
+
+        for div, lst in [
+                (LBE.div('', {'id': 'supertoc-div'}), super_toc),
+                (LBE.div('', {'id': 'toc-div'}), toc),
+        ]:
+            start, end = html_start_end_tags(div)
+            f.write(start)
+            f.writelines(lst.chunks)
+            f.write(end)
+
+        start, end = html_start_end_tags(LBE.div('', {'id': 'main-div'}))
+        start_2, end_2 = html_start_end_tags(LBE.div(''))
+        f.write(start)
+        f.write(start_2)
+        main_f.seek(0)
+        shutil.copyfileobj(main_f, f)
+        f.write(end_2)
+        f.write(end)
+
+        f.write(b'</body>\n</html>\n')
+
+
+class ShardedInterfaceLinks:
+
+    # xref stand-in for gen_messages_html() in sharded mode: links point to
+    # interface's div on the page of its protocol file
+
+    def __init__(self, xref, pages):
+        self.xref = xref
+        self.pages = pages
+
+    def interface_href(self, name):
+        href = self.xref.interface_href(name)
+        if href is None:
+            return None
+        return self.pages[name] + href
+
+
+def html_shard_page_names(obj_tree):
+
+    # one page per protocol file, named after its basename. names are made
+    # unique by numeric suffix, in collection order
+
+    ret = []
+    used = set(['index.html'])
+    for proto_file in obj_tree.protocol_files:
+        base = proto_file.basename
+        if base.endswith('.xml'):
+            base = base[:-4]
+        name = base + '.html'
+        n = 2
+        while name in used:
+            name = '{}-{}.html'.format(base, n)
+            n += 1
+        used.add(name)
+        ret.append(name)
+    return ret
+
+
+def html_shard_links(obj_tree, page_names):
+
+    # ShardedInterfaceLinks for pages, named by html_shard_page_names()
+
+    interface_pages = dict()
+    for proto_file, page in zip(obj_tree.protocol_files, page_names):
+        for protocol in proto_file.protocols:
+            for interface in protocol.interfaces:
+                interface_pages.setdefault(interface.name, page)
+
+    return ShardedInterfaceLinks(obj_tree.get_xref(), interface_pages)
+
+
+def html_shard_style():
+    return (textwrap.dedent(HTML_STYLE).strip() + '\n').encode('utf-8')
+
+
+def html_shard_page(proto_file, links):
+
+    # page of single protocol file. links - ShardedInterfaceLinks
+
+    toc = LBE.div('', {'id': 'toc-div'})
+
+    proto_file_div = generate_html_for_ProtocolFile(
+        proto_file,
+        toc,
+        [],
+        links
+    )
+
+    title = "{} - Wayland Protocols Documentation".format(
+        ', '.join([i.name for i in proto_file.protocols]))
+
+    html_struct = LBE.html(
+        gen_html_head(title, 'style.css'),
+        LBE.body(
+            LBE.div(
+                '',
+                {'id': 'supertoc-div'},
+                LBE.div(
+                    {'class': 'level1'},
+                    LBE.a({'href': 'index.html'}, 'index')
+                )
+            ),
+            toc,
+            LBE.div('', {'id': 'main-div'}, proto_file_div)
+        )
+    )
+
+    return lxml.etree.tostring(html_struct, pretty_print=True, method='html')
+
+
+def html_shard_index(obj_tree, page_names):
+
+    # index.html with list of protocols (same entries, as super toc of
+    # generate_html() has, but pointing to pages) and list of pages
+
+    super_toc = LBE.div('', {'id': 'supertoc-div'})
+    index_main_div = LBE.div('', {'id': 'main-div'})
+
+    for proto_file, page in zip(obj_tree.protocol_files, page_names):
+
+        for protocol in proto_file.protocols:
+            super_toc.append(
+                LBE.div(
+                    {'class': 'level1'},
+                    LBE.a(
+                        {'href': page + '#superid-' + protocol.name},
+                        protocol.name
+                    )
+                )
+            )
+
+        index_main_div.append(
+            LBE.div(
+                LBE.a({'href': page}, proto_file.basename),
+                " ; dirname: {}".format(proto_file.dirname)
+            )
+        )
+
+    html_struct = LBE.html(
+        gen_html_head(stylesheet='style.css'),
+        LBE.body(super_toc, index_main_div)
+    )
+
+    return lxml.etree.tostring(html_struct, pretty_print=True, method='html')
+
+
+def generate_html_sharded(
+        obj_tree,
+        directory,
+        compress=None,
+        level=None,
+        stats=None,
+        fragments=None
+):
+
+    # writes directory with style.css, index.html with super toc and one
+    # page per protocol file. only one page is kept in memory at a time.
+    # compress, level and stats are passed to open_artifact(). with
+    # fragments (OutputFragments) only pages of new and changed protocol
+    # files are written and pages of removed ones are deleted. returns list
+    # of file names in directory (without compressed variants)
+
+    os.makedirs(directory, exist_ok=True)
+
+    ret = []
+
+    if stats is None:
+        stats = dict()
+
+    def write(name, data):
+        with open_artifact(
+                os.path.join(directory, name),
+                compress=compress,
+                level=level,
+                stats=stats
+        ) as f:
+            f.write(data)
+
+    write('style.css', html_shard_style())
+    ret.append('style.css')
+
+    page_names = html_shard_page_names(obj_tree)
+
+    links = html_shard_links(obj_tree, page_names)
+
+    for proto_file, page in zip(obj_tree.protocol_files, page_names):
+
+        def make(proto_file):
+            write(page, html_shard_page(proto_file, links))
+
+        # in watch mode part is just a mark, that page is written
+
+        key = None
+        if fragments is not None:
+            key = (page, html_links_key(proto_file, links))
+
+        get_fragment(fragments, proto_file, make, key)
+        ret.append(page)
+
+    write('index.html', html_shard_index(obj_tree, page_names))
+    ret.append('index.html')
+
+    write_search_index(
+        obj_tree,
+        os.path.join(directory, 'search-index.json'),
+        page_names,
+        compress,
+        level,
+        stats,
+        sub_fragments(fragments, 'search-index')
+    )
+    ret.append('search-index.json')
+
+    if fragments is not None:
+        for name in set(fragments.names) - set(ret):
+            for suffix in [''] + list(COMPRESS_FORMATS.values()):
+                filename = os.path.join(directory, name + suffix)
+                if os.path.exists(filename):
+                    os.unlink(filename)
+        fragments.names = ret
+
+    return ret
+
+
+class SearchIndexBuilder:
+
+    # docs - list of [kind, name, parent], see wpd_search.SearchIndex. names
+    # and text - token -> sorted list of doc numbers. name tokens are made
+    # from qualified name, so 'wl_surface.attach' is found by 'surface' and
+    # 'attach'. whole names are matched by wpd_search.py from docs
+
+    def __init__(self):
+        self.docs = []
+        self.names = dict()
+        self.text = dict()
+        self.pages = []
+        self.page_numbers = dict()
+
+    def _add_tokens(self, dct, tokens, doc):
+        for i in tokens:
+            lst = dct.get(i)
+            if lst is None:
+                dct[i] = [doc]
+            elif lst[-1] != doc:
+                lst.append(doc)
+
+    def add(self, kind, name, parent, qname, texts):
+        doc = len(self.docs)
+        self.docs.append([SEARCH_KINDS.index(kind), name, parent])
+        self._add_tokens(self.names, search_tokens(qname), doc)
+        for i in texts:
+            self._add_tokens(self.text, search_tokens(i), doc)
+        return doc
+
+    def merge(self, part, page):
+
+        # appends docs of protocol file (see search_index_part()), which is
+        # on given page. part's doc numbers are shifted after existing ones
+
+        page_number = self.page_numbers.get(page)
+        if page_number is None:
+            page_number = len(self.pages)
+            self.page_numbers[page] = page_number
+            self.pages.append(page)
+
+        base = len(self.docs)
+        for kind, name, parent in part.docs:
+            if parent < 0:
+                parent = page_number
+            else:
+                parent += base
+            self.docs.append([kind, name, parent])
+
+        for dst, src in [(self.names, part.names), (self.text, part.text)]:
+            for token, docs in src.items():
+                lst = dst.get(token)
+                if lst is None:
+                    lst = []
+                    dst[token] = lst
+                lst.extend(i + base for i in docs)
+
+    def struct(self):
+        names = dict()
+        for k, v in self.names.items():
+            names[k] = delta_encode(v)
+        text = dict()
+        for k, v in self.text.items():
+            text[k] = delta_encode(v)
+        return {
+            'version': SEARCH_INDEX_VERSION,
+            'kinds': SEARCH_KINDS,
+            'pages': self.pages,
+            'docs': self.docs,
+            'names': names,
+            'text': text,
+        }
+
+
+def _descriptions_texts(obj):
+    ret = []
+    for i in obj.descriptions:
+        ret.append(i.summary)
+        ret.append(i.text)
+    return ret
+
+
+def search_index_part(proto_file):
+
+    # docs of one protocol file, numbered from 0. protocols get parent -1:
+    # their page is set by SearchIndexBuilder.merge(). anchors are the ids
+    # made by generate_html_for_ProtocolFile() and gen_messages_html(), see
+    # wpd_search.SearchIndex.doc()
+
+    builder = SearchIndexBuilder()
+
+    for protocol in proto_file.protocols:
+
+        protocol_doc = builder.add(
+            'protocol',
+            protocol.name,
+            -1,
+            protocol.name,
+            _descriptions_texts(protocol)
+        )
+
+        for interface in protocol.interfaces:
+
+            interface_doc = builder.add(
+                'interface',
+                interface.name,
+                protocol_doc,
+                interface.name,
+                _descriptions_texts(interface)
+            )
+
+            for kind, messages in [
+                    ('request', interface.requests),
+                    ('event', interface.events),
+            ]:
+                for message in messages:
+                    qname = interface.name + '.' + message.name
+                    message_doc = builder.add(
+                        kind,
+                        message.name,
+                        interface_doc,
+                        qname,
+                        _descriptions_texts(message)
+                    )
+                    for arg in message.arguments:
+                        builder.add(
+                            'arg',
+                            arg.name,
+                            message_doc,
+                            qname + '.' + arg.name,
+                            [arg.summary]
+                        )
+
+            for enum in interface.enums:
+                qname = interface.name + '.' + enum.name
+                enum_doc = builder.add(
+                    'enum',
+                    enum.name,
+                    interface_doc,
+                    qname,
+                    _descriptions_texts(enum)
+                )
+                for entry in enum.entries:
+                    builder.add(
+                        'entry',
+                        entry.name,
+                        enum_doc,
+                        qname + '.' + entry.name,
+                        [entry.summary]
+                    )
+
+    return builder
+
+
+def generate_search_index(obj_tree, page_names=None, fragments=None):
+
+    # page_names - page of each protocol file in sharded mode, None for
+    # single page. fragments - OutputFragments for docs of protocol files
+    # (watch mode): only docs of changed files are made again, then all
+    # are merged
+
+    builder = SearchIndexBuilder()
+
+    if page_names is None:
+        page_names = [''] * len(obj_tree.protocol_files)
+
+    for proto_file, page in zip(obj_tree.protocol_files, page_names):
+        builder.merge(
+            get_fragment(fragments, proto_file, search_index_part),
+            page
+        )
+
+    return builder.struct()
+
+
+def write_search_index(
+        obj_tree,
+        filename,
+        page_names=None,
+        compress=None,
+        level=None,
+        stats=None,
+        fragments=None
+):
+    t0 = time.perf_counter()
+    struct = generate_search_index(obj_tree, page_names, fragments)
+    with open_artifact(filename, True, compress, level, stats=stats) as f:
+        json.dump(struct, f, separators=(',', ':'))
+    print("search index {}: {} entries in {:.3f}s".format(
+        filename, len(struct['docs']), time.perf_counter() - t0))
+
+
+def generate_cpp_code(obj_tree):
+    out = io.StringIO()
+    generate_cpp_code_stream(obj_tree, out)
+    return out.getvalue()
+
+
+def generate_cpp_code_stream(obj_tree, f, fragments=None):
+    for i in cpp_code_stream_steps(obj_tree, f, fragments):
+        pass
+
+
+def cpp_code_stream_steps(obj_tree, f, fragments=None):
+
+    # generate_cpp_code_stream(), which yields after each protocol file
+
+    # TODO: add generation timestamp
+
+    f.write('''#ifndef WAYROUND_I2P_20240211_135005_438825
+#define WAYROUND_I2P_20240211_135005_438825
+
+namespace wayround_i2p::waylandcc {
+    
+/*
+    WARNING! This file GENERTED using
+             https://github.com/AnimusPEXUS/wayland_proto_docker
+             tool.
+*/
+
+''')
+    yield from obj_tree.write_cpp_steps(f, fragments)
+    f.write('''
+
+}
+
+#endif
+''')
+
+
+def open_compressed(filename, fmt, level=None):
+    if level is None:
+        level = COMPRESS_DEFAULT_LEVELS[fmt]
+    if fmt == 'gzip':
+        # zero mtime - same content gives same .gz file
+        return gzip.GzipFile(filename, 'wb', compresslevel=level, mtime=0)
+    if fmt == 'xz':
+        return lzma.LZMAFile(filename, 'wb', preset=level)
+    raise RuntimeError("invalid compression format: {}".format(fmt))
+
+
+def parse_compress_formats(value):
+    ret = []
+    for i in value.split(','):
+        i = i.strip()
+        if i == '':
+            continue
+        if i == 'lzma':
+            i = 'xz'
+        if i not in COMPRESS_FORMATS:
+            raise RuntimeError(
+                "invalid compression format: {}. valid are {}".format(
+                    i, list(COMPRESS_FORMATS)))
+        if i not in ret:
+            ret.append(i)
+    return ret
+
+
+class ArtifactWriter(io.RawIOBase):
+
+    # writes same data into output file (stdout, if output is '-') and into
+    # its compressed variants (output + '.gz', ...) at once, so artifacts
+    # are not read again for compression. sinks are
+    # [format, filename, file, seconds spent in writes], format of the
+    # output file itself is ''
+
+    def __init__(self, output, compress=None, level=None, stdout=None):
+        super().__init__()
+
+        if compress is None:
+            compress = []
+
+        self.output = output
+        self.size = 0
+        self.elapsed = 0.0
+        self.sinks = []
+        self._t0 = time.perf_counter()
+
+        if output == '-':
+            if len(compress) != 0:
+                raise RuntimeError(
+                    "compressed variants can't be written for stdout output")
+            if stdout is None:
+                stdout = sys.stdout.buffer
+            self.sinks.append(['', output, stdout, 0.0])
+        else:
+            self.sinks.append(['', output, open(output, 'wb'), 0.0])
+
+        for fmt in compress:
+            name = output + COMPRESS_FORMATS[fmt]
+            self.sinks.append(
+                [fmt, name, open_compressed(name, fmt, level), 0.0])
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        for sink in self.sinks:
+            t0 = time.perf_counter()
+            sink[2].write(b)
+            sink[3] += time.perf_counter() - t0
+        self.size += len(b)
+        return len(b)
+
+    def close(self):
+        if self.closed:
+            return
+        for sink in self.sinks:
+            t0 = time.perf_counter()
+            if sink[1] == '-':
+                sink[2].flush()
+            else:
+                sink[2].close()
+            sink[3] += time.perf_counter() - t0
+        self.elapsed = time.perf_counter() - self._t0
+        super().close()
+
+    def sink_size(self, sink):
+        if sink[0] == '':
+            return self.size
+        return os.path.getsize(sink[1])
+
+    def stats_txt(self):
+        name = self.output
+        if name == '-':
+            name = 'stdout'
+        ret = "written {}: {} bytes in {:.3f}s ({:.3f}s writing)".format(
+            name, self.size, self.elapsed, self.sinks[0][3])
+        for sink in self.sinks[1:]:
+            size = self.sink_size(sink)
+            ratio = 0.0
+            if self.size != 0:
+                ratio = 100 * size / self.size
+            ret += "\n  {}: {} bytes ({:.1f}%), {:.3f}s compressing".format(
+                sink[1], size, ratio, sink[3])
+        return ret
+
+    def add_stats(self, stats):
+        # stats - format -> [files, bytes, seconds spent in writes]
+        for sink in self.sinks:
+            s = stats.setdefault(sink[0], [0, 0, 0.0])
+            s[0] += 1
+            s[1] += self.sink_size(sink)
+            s[2] += sink[3]
+
+
+@contextlib.contextmanager
+def open_artifact(
+        output,
+        text=False,
+        compress=None,
+        level=None,
+        stdout=None,
+        stats=None
+):
+
+    # yields buffered file object for output. its statistics are printed on
+    # close or, if stats dict is given, added to it (see
+    # ArtifactWriter.add_stats)
+
+    raw = ArtifactWriter(output, compress, level, stdout)
+    f = io.BufferedWriter(raw, ARTIFACT_BUFFER_SIZE)
+    if text:
+        f = io.TextIOWrapper(f, encoding='utf-8')
+    try:
+        yield f
+    finally:
+        f.close()
+
+    if ACTIVE_PROFILER is not None:
+        ACTIVE_PROFILER.add_artifact(raw)
+
+    if stats is None:
+        print(raw.stats_txt())
+    else:
+        raw.add_stats(stats)
+
+
+def artifacts_stats_txt(stats):
+    ret = []
+    for fmt in [''] + list(COMPRESS_FORMATS):
+        if fmt not in stats:
+            continue
+        files, size, t = stats[fmt]
+        ret.append("{} {}files: {} bytes, {:.3f}s {}".format(
+            files,
+            fmt + ' ' if fmt != '' else '',
+            size,
+            t,
+            'compressing' if fmt != '' else 'writing'
+        ))
+    return '\n'.join(ret)
+
+
+def xml_files_signatures(cwd, xml_files):
+
+    # path -> (mtime, size) of each file. files, which can't be stat'ed,
+    # are omitted
+
+    ret = dict()
+    for i in xml_files:
+        try:
+            st = os.stat(os.path.join(cwd, i))
+        except OSError:
+            continue
+        ret[os.path.normpath(i)] = (st.st_mtime_ns, st.st_size)
+    return ret
+
+
+def update_ProtocolCollection_for_files(
+        cwd,
+        obj_tree,
+        changed,
+        removed,
+        cache=None
+):
+
+    # re-parses changed (and new) files and removes protocol files of
+    # removed ones. paths are relative to cwd. collection's index is kept
+    # up to date by add/replace/remove_protocol_file(), SYMBOLS - by
+    # prune_symbols()
+
+    by_path = dict()
+    for pf in obj_tree.protocol_files:
+        by_path[os.path.normpath(os.path.join(pf.dirname, pf.basename))] = pf
+
+    loaded = dict()
+    for pf in generate_ProtocolCollection_for_files(
+            cwd,
+            changed,
+            1,
+            cache
+    ).protocol_files:
+        loaded[os.path.normpath(os.path.join(pf.dirname, pf.basename))] = pf
+
+    for i in list(changed) + list(removed):
+        path = os.path.normpath(i)
+        old = by_path.get(path)
+        new = loaded.get(path)
+        if old is not None and new is not None:
+            obj_tree.replace_protocol_file(old, new)
+        elif old is not None:
+            obj_tree.remove_protocol_file(old)
+        elif new is not None:
+            obj_tree.add_protocol_file(new)
+
+    obj_tree.sort_protocol_files()
+
+    prune_symbols(obj_tree.protocol_files)
+
+
+class InotifyWatcher:
+
+    # inotify(7) through libc. every directory, which find_all_xml_files()
+    # would scan, is watched. wait() returns paths (relative to top) of
+    # changed .xml files and directories. poll() does the same without
+    # waiting
+
+    def __init__(self, top, exclude=None):
+
+        if exclude is None:
+            exclude = []
+
+        libc_name = ctypes.util.find_library('c')
+        if libc_name is None:
+            raise OSError("libc not found")
+
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.libc.inotify_init1.argtypes = [ctypes.c_int]
+        self.libc.inotify_add_watch.argtypes = [
+            ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32
+        ]
+
+        fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            e = ctypes.get_errno()
+            raise OSError(e, os.strerror(e))
+
+        self.fd = fd
+        self.top = os.path.abspath(top)
+        self.exclude = exclude
+        self.wds = dict()
+
+        self._add_tree('.')
+
+    def _add_tree(self, d):
+
+        mask = (
+            IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE
+            | IN_DELETE | IN_ONLYDIR
+        )
+
+        dirs_to_watch = collections.deque()
+        dirs_to_watch.append(d)
+
+        while len(dirs_to_watch) != 0:
+            d = dirs_to_watch.popleft()
+
+            wd = self.libc.inotify_add_watch(
+                self.fd,
+                os.fsencode(os.path.join(self.top, d)),
+                mask
+            )
+            if wd < 0:
+                e = ctypes.get_errno()
+                print("can't watch directory {}. error: {}".format(
+                    d, os.strerror(e)))
+                continue
+            self.wds[wd] = d
+
+            try:
+                it = os.scandir(os.path.join(self.top, d))
+            except OSError:
+                continue
+
+            with it:
+                for i in it:
+                    r_path = os.path.join(d, i.name)
+                    if (i.is_dir(follow_symlinks=False)
+                            and not skip_dir(i.name, r_path[2:], self.exclude)):
+                        dirs_to_watch.append(r_path)
+
+    def _read(self, timeout):
+
+        r, w, x = select.select([self.fd], [], [], timeout)
+        if len(r) == 0:
+            return []
+
+        try:
+            buf = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        ret = []
+
+        offset = 0
+        while offset + IN_EVENT.size <= len(buf):
+            wd, mask, cookie, length = IN_EVENT.unpack_from(buf, offset)
+            offset += IN_EVENT.size
+            name = os.fsdecode(buf[offset:offset + length].rstrip(b'\0'))
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                # events are lost. caller rescans everything anyway
+                ret.append('.')
+                continue
+
+            if mask & IN_IGNORED:
+                self.wds.pop(wd, None)
+                continue
 
-            '''),
-        ),
-        body
+            d = self.wds.get(wd)
+            if d is None:
+                continue
+
+            path = os.path.join(d, name)
+
+            if mask & IN_ISDIR:
+                if skip_dir(name, path[2:], self.exclude):
+                    continue
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self._add_tree(path)
+                ret.append(path)
+            elif name.endswith('.xml'):
+                ret.append(path)
+
+        return ret
+
+    def poll(self):
+        return self._read(0)
+
+    def wait(self):
+        while True:
+            ret = self._read(None)
+            if len(ret) != 0:
+                break
+        while True:
+            more = self._read(WATCH_DEBOUNCE)
+            if len(more) == 0:
+                break
+            ret += more
+        return ret
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+
+    # fallback for systems without inotify. wait() returns None (anything
+    # could change) every interval seconds. poll() returns None, if interval
+    # is passed since previous check, [] otherwise
+
+    def __init__(self, interval=WATCH_POLL_INTERVAL):
+        self.interval = interval
+        self.last = time.monotonic()
+
+    def poll(self):
+        now = time.monotonic()
+        if now - self.last < self.interval:
+            return []
+        self.last = now
+        return None
+
+    def wait(self):
+        time.sleep(self.interval)
+        self.last = time.monotonic()
+        return None
+
+    def close(self):
+        pass
+
+
+def open_watcher(cwd, exclude=None, poll_interval=None):
+
+    # InotifyWatcher, if it's available and poll_interval is not given,
+    # PollingWatcher otherwise
+
+    if poll_interval is None:
+        try:
+            watcher = InotifyWatcher(cwd, exclude)
+            print("watching {} directories with inotify".format(
+                len(watcher.wds)))
+            return watcher
+        except (OSError, AttributeError) as e:
+            print("inotify is not available ({}), polling".format(e))
+            poll_interval = WATCH_POLL_INTERVAL
+
+    print("polling every {}s".format(poll_interval))
+    return PollingWatcher(poll_interval)
+
+
+def find_xml_changes(cwd, signatures, include=None, exclude=None):
+
+    # rescans cwd. returns lists of changed (and new) and removed files and
+    # new signatures (see xml_files_signatures())
+
+    new_signatures = xml_files_signatures(
+        cwd,
+        find_all_xml_files(cwd, include, exclude)
     )
 
-    ret = lxml.etree.tostring(
-        html_struct,
-        pretty_print=True,
-        method='html'
+    changed = []
+    for i in new_signatures:
+        if signatures.get(i) != new_signatures[i]:
+            changed.append(i)
+
+    removed = []
+    for i in signatures:
+        if i not in new_signatures:
+            removed.append(i)
+
+    return changed, removed, new_signatures
+
+
+def watch_files(
+        cwd,
+        obj_tree,
+        xml_files,
+        write,
+        include=None,
+        exclude=None,
+        cache=None,
+        poll_interval=None
+):
+
+    # keeps obj_tree in memory, re-parses changed xml files and calls
+    # write() to regenerate outputs. runs until interrupted. latency is
+    # counted from modification time of newest changed file
+
+    watcher = open_watcher(cwd, exclude, poll_interval)
+
+    signatures = xml_files_signatures(cwd, xml_files)
+
+    try:
+        while True:
+            events = watcher.wait()
+
+            t0 = time.perf_counter()
+
+            changed, removed, signatures = find_xml_changes(
+                cwd,
+                signatures,
+                include,
+                exclude
+            )
+
+            if len(changed) == 0 and len(removed) == 0:
+                if events is not None:
+                    print("no protocol changes in {} events".format(
+                        len(events)))
+                continue
+
+            print("{} changed, {} removed xml files".format(
+                len(changed), len(removed)))
+
+            update_ProtocolCollection_for_files(
+                cwd,
+                obj_tree,
+                changed,
+                removed,
+                cache
+            )
+
+            t1 = time.perf_counter()
+
+            write()
+
+            t2 = time.perf_counter()
+
+            latency = ''
+            if len(changed) != 0:
+                newest = max(signatures[i][0] for i in changed) / 1e9
+                latency = ", {:.3f}s from edit to output".format(
+                    time.time() - newest)
+
+            print(
+                "updated in {:.3f}s: re-parsing {:.3f}s,"
+                " writing {:.3f}s{}".format(
+                    t2 - t0,
+                    t1 - t0,
+                    t2 - t1,
+                    latency
+                )
+            )
+
+    except KeyboardInterrupt:
+        print("watch stopped")
+
+    finally:
+        watcher.close()
+
+
+def accepts_gzip(accept_encoding):
+    for i in accept_encoding.split(','):
+        params = i.strip().split(';')
+        if params[0].strip().lower() not in ['gzip', '*']:
+            continue
+        for j in params[1:]:
+            k, _, v = j.partition('=')
+            if k.strip() == 'q':
+                try:
+                    if float(v) == 0:
+                        return False
+                except ValueError:
+                    return False
+        return True
+    return False
+
+
+class DocServer:
+
+    # serves html-sharded layout (index.html, style.css, page per protocol
+    # file and search-index.json) over http from in-memory collection.
+    # files are rendered on first request and kept in LRU cache. cache
+    # entries are [protocol file, key, body, etag, gzipped body]. key is the
+    # same as generate_html_sharded() uses in watch mode, so after
+    # collection changes only entries of affected pages are rendered again.
+    # search index docs of protocol files are kept in search_fragments
+
+    def __init__(self, obj_tree, cache_size=SERVE_CACHE_SIZE, level=None):
+        self.obj_tree = obj_tree
+        self.cache_size = cache_size
+        if level is None:
+            level = COMPRESS_DEFAULT_LEVELS['gzip']
+        self.level = level
+        self.cache = collections.OrderedDict()
+        self.search_fragments = OutputFragments()
+        self.generation = 0
+        self.rendered = 0
+        self.served = 0
+        self.update()
+
+    def update(self):
+
+        # must be called after collection changes
+
+        self.page_names = html_shard_page_names(self.obj_tree)
+        self.pages = dict(zip(self.page_names, self.obj_tree.protocol_files))
+        self.links = html_shard_links(self.obj_tree, self.page_names)
+        self.search_fragments.retain(self.obj_tree.protocol_files)
+        self.generation += 1
+
+    def _source(self, name):
+
+        # (protocol file, key, render function) for file name, None if
+        # there is no such file
+
+        if name == 'style.css':
+            return None, None, html_shard_style
+
+        if name == 'index.html':
+            return (
+                None,
+                self.generation,
+                lambda: html_shard_index(self.obj_tree, self.page_names)
+            )
+
+        if name == 'search-index.json':
+            return (
+                None,
+                self.generation,
+                lambda: json.dumps(
+                    generate_search_index(
+                        self.obj_tree,
+                        self.page_names,
+                        self.search_fragments
+                    ),
+                    separators=(',', ':')
+                ).encode('utf-8')
+            )
+
+        pf = self.pages.get(name)
+        if pf is None:
+            return None
+
+        return (
+            pf,
+            html_links_key(pf, self.links),
+            lambda: html_shard_page(pf, self.links)
+        )
+
+    def get(self, name):
+
+        # cache entry for file name, None if there is no such file. second
+        # value is True, if file is rendered by this call
+
+        source = self._source(name)
+        if source is None:
+            return None, False
+
+        pf, key, render = source
+
+        entry = self.cache.get(name)
+        if entry is not None and entry[0] is pf and entry[1] == key:
+            self.cache.move_to_end(name)
+            return entry, False
+
+        body = render()
+        entry = [
+            pf,
+            key,
+            body,
+            '"{}"'.format(hashlib.sha1(body).hexdigest()),
+            None
+        ]
+        self.rendered += 1
+
+        self.cache[name] = entry
+        self.cache.move_to_end(name)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+        return entry, True
+
+    def respond(self, method, target, headers):
+
+        # returns status, list of headers, body and note for log
+
+        if method not in ['GET', 'HEAD']:
+            return 405, [('Allow', 'GET, HEAD')], b'', ''
+
+        name = urllib.parse.unquote(urllib.parse.urlsplit(target).path)
+        name = name.lstrip('/')
+        if name == '':
+            name = 'index.html'
+
+        entry, rendered = self.get(name)
+        if entry is None:
+            return 404, [('Content-Type', 'text/plain')], b'not found\n', ''
+
+        note = 'rendered' if rendered else 'cached'
+
+        body = entry[2]
+        etag = entry[3]
+        resp_headers = [
+            ('Content-Type', SERVE_CONTENT_TYPES[os.path.splitext(name)[1]]),
+            ('Cache-Control', 'no-cache'),
+            ('Vary', 'Accept-Encoding'),
+        ]
+
+        gz = accepts_gzip(headers.get('accept-encoding', ''))
+        if gz:
+            etag = etag[:-1] + '-gzip"'
+
+        resp_headers.append(('ETag', etag))
+
+        if_none_match = headers.get('if-none-match', '')
+        if etag in [i.strip() for i in if_none_match.split(',')]:
+            return 304, resp_headers, b'', note
+
+        if gz:
+            if entry[4] is None:
+                entry[4] = gzip.compress(body, self.level, mtime=0)
+            body = entry[4]
+            resp_headers.append(('Content-Encoding', 'gzip'))
+            note += ', gzip'
+
+        return 200, resp_headers, body, note
+
+    async def handle(self, reader, writer):
+
+        # http/1.1 with keep-alive. request bodies are not expected
+
+        try:
+            while True:
+                line = await reader.readline()
+                if line == b'':
+                    break
+
+                t0 = time.perf_counter()
+
+                try:
+                    method, target, version = line.decode('latin-1').split()
+                except ValueError:
+                    writer.write(
+                        b'HTTP/1.1 400 Bad Request\r\n'
+                        b'Content-Length: 0\r\nConnection: close\r\n\r\n'
+                    )
+                    break
+
+                headers = dict()
+                while True:
+                    line = await reader.readline()
+                    if line in [b'\r\n', b'\n', b'']:
+                        break
+                    k, _, v = line.decode('latin-1').partition(':')
+                    headers[k.strip().lower()] = v.strip()
+
+                keep_alive = (
+                    version == 'HTTP/1.1'
+                    and headers.get('connection', '').lower() != 'close'
+                )
+
+                status, resp_headers, body, note = self.respond(
+                    method, target, headers)
+
+                head = ['HTTP/1.1 {} {}'.format(
+                    status, http.HTTPStatus(status).phrase)]
+                for k, v in resp_headers:
+                    head.append('{}: {}'.format(k, v))
+                head.append('Content-Length: {}'.format(len(body)))
+                if not keep_alive:
+                    head.append('Connection: close')
+                writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1'))
+                if method != 'HEAD':
+                    writer.write(body)
+                await writer.drain()
+
+                self.served += 1
+
+                print("{} {} {} {:.4f}s {}".format(
+                    method, target, status, time.perf_counter() - t0, note))
+
+                if not keep_alive:
+                    break
+
+        except ConnectionError:
+            pass
+
+        finally:
+            writer.close()
+
+
+async def _serve(
+        cwd,
+        obj_tree,
+        xml_files,
+        host,
+        port,
+        include,
+        exclude,
+        cache,
+        poll_interval,
+        cache_size,
+        level
+):
+
+    doc_server = DocServer(obj_tree, cache_size, level)
+
+    server = await asyncio.start_server(doc_server.handle, host, port)
+
+    for i in server.sockets:
+        print("serving on http://{}:{}/".format(*i.getsockname()[:2]))
+
+    watcher = open_watcher(cwd, exclude, poll_interval)
+
+    signatures = xml_files_signatures(cwd, xml_files)
+
+    async with server:
+        try:
+            while True:
+                await asyncio.sleep(WATCH_DEBOUNCE)
+
+                if watcher.poll() == []:
+                    continue
+
+                t0 = time.perf_counter()
+
+                changed, removed, signatures = find_xml_changes(
+                    cwd,
+                    signatures,
+                    include,
+                    exclude
+                )
+
+                if len(changed) == 0 and len(removed) == 0:
+                    continue
+
+                update_ProtocolCollection_for_files(
+                    cwd,
+                    obj_tree,
+                    changed,
+                    removed,
+                    cache
+                )
+
+                doc_server.update()
+
+                print(
+                    "{} changed, {} removed xml files, updated in"
+                    " {:.3f}s".format(
+                        len(changed),
+                        len(removed),
+                        time.perf_counter() - t0
+                    )
+                )
+
+        finally:
+            watcher.close()
+
+
+def serve(
+        cwd,
+        obj_tree,
+        xml_files,
+        host=SERVE_HOST,
+        port=SERVE_PORT,
+        include=None,
+        exclude=None,
+        cache=None,
+        poll_interval=None,
+        cache_size=SERVE_CACHE_SIZE,
+        level=None
+):
+
+    # serves documentation until interrupted. source changes are watched
+    # the same way, as with --watch
+
+    try:
+        asyncio.run(
+            _serve(
+                cwd,
+                obj_tree,
+                xml_files,
+                host,
+                port,
+                include,
+                exclude,
+                cache,
+                poll_interval,
+                cache_size,
+                level
+            )
+        )
+    except KeyboardInterrupt:
+        print("server stopped")
+
+
+# targets, which keep generated parts in OutputFragments
+FRAGMENT_TARGETS = [
+    'html', 'html-sharded', 'yaml', 'yaml-documents', 'json', 'c++'
+]
+
+# targets, which write_walk_targets() writes together. html is binary
+# artifact, others are text
+WALK_TARGETS = ['html', 'yaml', 'yaml-documents', 'json', 'c++']
+
+
+def walk_target_steps(target, obj_tree, f, fragments, struct_of):
+    if target == 'html':
+        return html_stream_steps(obj_tree, f, fragments)
+    if target == 'yaml':
+        return yaml_stream_steps(obj_tree, f, fragments, struct_of)
+    if target == 'yaml-documents':
+        return yaml_documents_stream_steps(obj_tree, f, fragments, struct_of)
+    if target == 'json':
+        return json_stream_steps(obj_tree, f, fragments, struct_of)
+    if target == 'c++':
+        return cpp_code_stream_steps(obj_tree, f, fragments)
+    raise RuntimeError("invalid target")
+
+
+def write_walk_targets(
+        obj_tree,
+        targets,
+        outputs,
+        compress=None,
+        level=None,
+        stdout=None,
+        fragments=None
+):
+
+    # writes several of WALK_TARGETS with one walk of protocol files: all
+    # outputs are opened first, then part of each protocol file for every
+    # target is made and written to its output right away, so memory is
+    # used as with --stream for single target. yaml and json share simple
+    # struct of protocol file. fragments - dict of OutputFragments by target
+    # (watch mode). returns dict of [wall, cpu] by target: time of making
+    # and writing its parts (shared simple struct counts for the first
+    # target, which asks for it), closing its output and, for html, writing
+    # search index
+
+    timings = dict()
+    struct_of = LastSimpleStruct()
+
+    with contextlib.ExitStack() as stack:
+
+        steps = []
+
+        for target in targets:
+            start = clock()
+            print("generating {}".format(target))
+            target_fragments = None
+            if fragments is not None:
+                target_fragments = fragments.get(target)
+                target_fragments.retain(obj_tree.protocol_files)
+            target_stack = stack.enter_context(contextlib.ExitStack())
+            f = target_stack.enter_context(
+                open_artifact(
+                    outputs[target],
+                    target != 'html',
+                    compress,
+                    level,
+                    stdout
+                )
+            )
+            steps.append([
+                target,
+                target_stack,
+                walk_target_steps(
+                    target,
+                    obj_tree,
+                    f,
+                    target_fragments,
+                    struct_of
+                )
+            ])
+            add_clock(timings, target, start)
+
+        # last round writes endings of outputs
+        for i in range(len(obj_tree.protocol_files) + 1):
+            for target, target_stack, target_steps in steps:
+                start = clock()
+                next(target_steps, None)
+                add_clock(timings, target, start)
+
+        for target, target_stack, target_steps in steps:
+            start = clock()
+            target_stack.close()
+            if target == 'html':
+                target_fragments = None
+                if fragments is not None:
+                    target_fragments = fragments.get(target)
+                write_html_search_index(
+                    obj_tree,
+                    outputs[target],
+                    compress,
+                    level,
+                    target_fragments
+                )
+            add_clock(timings, target, start)
+
+    return timings
+
+
+_WORKER_TREE = None
+
+
+def _init_target_worker(obj_tree, yaml_dumper):
+    global _WORKER_TREE, YAML_DUMPER
+    _WORKER_TREE = obj_tree
+    YAML_DUMPER = yaml_dumper
+
+
+def _write_target_in_worker(target, output, stream, compress, level):
+    # stdout stream can't be passed to worker, and worker's sys.stdout is
+    # stderr, when output is stdout (see main()), so original stdout is
+    # taken
+    stdout = None
+    if output == '-':
+        stdout = sys.__stdout__.buffer
+    start = time.perf_counter()
+    write_target(
+        _WORKER_TREE,
+        target,
+        output,
+        stream,
+        compress,
+        level,
+        stdout
     )
+    return time.perf_counter() - start
+
+
+def write_targets(
+        obj_tree,
+        targets,
+        outputs,
+        stream=False,
+        compress=None,
+        level=None,
+        stdout=None,
+        fragments=None,
+        parallel=None
+):
+
+    # writes every target from the same tree. outputs - output file by
+    # target. fragments - dict of OutputFragments by target (watch mode).
+    # parallel - None, 'threads' or 'processes': write each target in its
+    # own thread or process. otherwise several of WALK_TARGETS are written
+    # together with one walk of the tree (see write_walk_targets())
+
+    times = dict()
+
+    if fragments is not None:
+        for target_fragments in fragments.values():
+            target_fragments.reset_stats()
+
+    if parallel is None:
+
+        walk = []
+        for target in targets:
+            if target in WALK_TARGETS:
+                walk.append(target)
+
+        if len(walk) > 1:
+            with profile_stage(ACTIVE_PROFILER, 'emit walk'):
+                timings = write_walk_targets(
+                    obj_tree,
+                    walk,
+                    outputs,
+                    compress,
+                    level,
+                    stdout,
+                    fragments
+                )
+            for target in walk:
+                times[target] = timings[target][0]
+        else:
+            walk = []
 
-    return ret
+        for target in targets:
+            if target in walk:
+                continue
+            target_fragments = None
+            if fragments is not None:
+                target_fragments = fragments.get(target)
+            start = time.perf_counter()
+            with profile_stage(ACTIVE_PROFILER, 'emit ' + target):
+                write_target(
+                    obj_tree,
+                    target,
+                    outputs[target],
+                    stream,
+                    compress,
+                    level,
+                    stdout,
+                    target_fragments
+                )
+            times[target] = time.perf_counter() - start
+
+    elif parallel == 'threads':
+
+        # shared caches of the tree are made before threads start
+        obj_tree.get_xref()
+
+        def write(target):
+            target_fragments = None
+            if fragments is not None:
+                target_fragments = fragments.get(target)
+            start = time.perf_counter()
+            write_target(
+                obj_tree,
+                target,
+                outputs[target],
+                stream,
+                compress,
+                level,
+                stdout,
+                target_fragments
+            )
+            return time.perf_counter() - start
+
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=len(targets)
+        ) as executor:
+            for target, t in zip(targets, executor.map(write, targets)):
+                times[target] = t
+
+    elif parallel == 'processes':
+
+        if fragments is not None:
+            raise RuntimeError("fragments can't be kept in processes")
+
+        # tree is sent to each worker once
+        with concurrent.futures.ProcessPoolExecutor(
+                max_workers=len(targets),
+                initializer=_init_target_worker,
+                initargs=(obj_tree, YAML_DUMPER)
+        ) as executor:
+            futures = []
+            for target in targets:
+                futures.append(
+                    executor.submit(
+                        _write_target_in_worker,
+                        target,
+                        outputs[target],
+                        stream,
+                        compress,
+                        level
+                    )
+                )
+            for target, future in zip(targets, futures):
+                times[target] = future.result()
 
+    else:
+        raise RuntimeError("invalid parallel mode: {}".format(parallel))
+
+    if len(targets) > 1:
+        for target in targets:
+            print("{} ({}): {:.3f}s".format(
+                target, outputs[target], times[target]))
+
+    return times
+
+
+def write_html_search_index(
+        obj_tree,
+        output,
+        compress=None,
+        level=None,
+        fragments=None
+):
+    # search-index.json next to html file. fragments - OutputFragments of
+    # html target
+    if output == '-':
+        print("search index is not written for stdout output")
+        return
+    write_search_index(
+        obj_tree,
+        os.path.join(os.path.dirname(output), 'search-index.json'),
+        compress=compress,
+        level=level,
+        fragments=sub_fragments(fragments, 'search-index')
+    )
 
-def generate_cpp_code(obj_tree):
 
-    # TODO: add generation timestamp
+def write_target(
+        obj_tree,
+        target,
+        output,
+        stream=False,
+        compress=None,
+        level=None,
+        stdout=None,
+        fragments=None
+):
 
-    ret = '''#ifndef WAYROUND_I2P_20240211_135005_438825
-#define WAYROUND_I2P_20240211_135005_438825
+    # fragments - OutputFragments, which keep parts of output between calls
+    # (watch mode). output is assembled from them in streaming mode
 
-namespace wayround_i2p::waylandcc {
-    
-/*
-    WARNING! This file GENERTED using
-             https://github.com/AnimusPEXUS/wayland_proto_docker
-             tool.
-*/
+    if fragments is not None:
+        fragments.retain(obj_tree.protocol_files)
+        stream = True
 
-''' + obj_tree.gen_cpp() + '''
+    if target == 'html':
+        print("generating html")
 
-}
+        with open_artifact(output, False, compress, level, stdout) as f:
+            if stream:
+                generate_html_stream(obj_tree, f, fragments)
+            else:
+                f.write(generate_html(obj_tree))
 
-#endif
-'''
-    return ret
+        write_html_search_index(obj_tree, output, compress, level, fragments)
+
+    elif target == 'html-sharded':
+        print("generating sharded html")
+
+        artifacts_stats = dict()
+        written = generate_html_sharded(
+            obj_tree,
+            output,
+            compress,
+            level,
+            artifacts_stats,
+            fragments
+        )
+
+        print("written {} files into {}".format(len(written), output))
+        print(artifacts_stats_txt(artifacts_stats))
+
+    elif target == 'yaml':
+        print("generating yaml")
+
+        with open_artifact(output, True, compress, level, stdout) as f:
+            if stream:
+                generate_yaml_stream(obj_tree, f, fragments)
+            else:
+                struct = generate_simple_struct(obj_tree)
+                f.write(generate_yaml(struct))
+
+    elif target == 'yaml-documents':
+        print("generating yaml documents")
+
+        with open_artifact(output, True, compress, level, stdout) as f:
+            generate_yaml_documents_stream(obj_tree, f, fragments)
+
+    elif target == 'json':
+        print("generating json")
+
+        with open_artifact(output, True, compress, level, stdout) as f:
+            if stream:
+                generate_json_stream(obj_tree, f, fragments)
+            else:
+                struct = generate_simple_struct(obj_tree)
+                f.write(generate_json(struct))
+
+    elif target == 'binary':
+        print("generating binary")
+
+        with open_artifact(output, False, compress, level, stdout) as f:
+            generate_binary_stream(obj_tree, f)
+
+    elif target == 'sqlite':
+        print("generating sqlite database")
+
+        # sqlite writes to file by its name, so database is made in temporary
+        # directory and copied to output. this way it can be compressed or
+        # written to stdout, as other targets
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'wayland-protocols.sqlite')
+            counts = generate_sqlite(obj_tree, filename)
+            with open(filename, 'rb') as src, open_artifact(
+                    output, False, compress, level, stdout
+            ) as f:
+                shutil.copyfileobj(src, f, ARTIFACT_BUFFER_SIZE)
+
+        print("rows: {}".format(
+            ', '.join('{} {}'.format(k, v) for k, v in counts.items())))
+
+    elif target == 'c++':
+        print(f"generating c++ header file")
+
+        with open_artifact(output, True, compress, level, stdout) as f:
+            generate_cpp_code_stream(obj_tree, f, fragments)
+
+    else:
+        raise RuntimeError("invalid target")
 
 
 def print_help():
     print(
         """
-{cmd} [options] target
+{cmd} [options] target [target ...]
 
   recurcively searches for .xml files in current directory and trying to
-  find wayland protocols in them.
-
-  -o  filename    - where to store. if omitted - generated automatically
+  find wayland protocols in them. several targets can be generated in one
+  run from the same parsed tree
+
+  -o  filename    - where to store. if omitted - generated automatically.
+                    can be used only with single target.
+                    '-' writes output to stdout (not for html-sharded),
+                    progress messages go to stderr then
+
+  -j  N           - parse xml files and generate tree using N worker
+                    processes. default is 1 (no worker processes)
+
+  --include pattern
+                  - use only .xml files, matching glob pattern (relative to
+                    the script's directory). can be given several times
+  --exclude pattern
+                  - skip files and directories, matching glob pattern. can
+                    be given several times. hidden directories and
+                    directories named {skip_dirs} are always skipped
+
+  --order-config filename
+                  - yaml file with protocol file ordering and stability
+                    rules. see load_order_config() for format
+
+  --stream        - write output while generating it, instead of building
+                    whole document in memory first (html, yaml, json)
+
+  --fast-yaml     - use libyaml emitter for yaml targets, if pyyaml has it.
+                    it's several times faster, but wraps long strings
+                    differently from default python emitter
+
+  --parallel mode - with several targets, write each target in its own
+                    thread or process (mode is threads or processes).
+                    without it targets are written one by one, with their
+                    parts generated in one walk of the tree
+
+  --compress formats
+                  - also write compressed variants of output files, while
+                    writing them. formats - comma separated list of {formats}
+                    (for example gzip,xz). index.html gets index.html.gz,
+                    index.html.xz, etc.
+  --compress-level N
+                  - compression level, 0-9. default is {levels}
+
+  --watch         - after generation, keep running and watch for changes of
+                    .xml files (with inotify, if available). only changed
+                    files are parsed again and only parts of output, which
+                    depend on them, are generated again
+  --watch-poll seconds
+                  - same as --watch, but check files for changes every
+                    given seconds instead of using inotify
+
+  --host host     - address for serve target to listen on. default is
+                    {serve_host}
+  --port port     - port for serve target. default is {serve_port}
+  --serve-cache N - number of rendered files serve target keeps in memory.
+                    default is {serve_cache}. gzip level is taken from
+                    --compress-level
+
+  --profile filename
+                  - save json report with wall and cpu time of each stage
+                    (scan, load, sort, index, xref, emit) and of parsing
+                    (with reading) and building of each file, peak rss and
+                    sizes and write times of output files. with --watch and
+                    serve only the first run is profiled
+  --profile-memory
+                  - add tracemalloc peaks to --profile report. makes run
+                    much slower
+  --profile-cprofile filename
+                  - save cProfile stats of the run (main process only) to
+                    filename. see python's pstats module
+
+  --cache-dir dir - keep generated tree of each xml file in dir and reuse
+                    it on next runs, if file is not changed
+  --cache-max-size size
+                  - remove least recently used cache entries, while cache
+                    is bigger than size. k, M and G suffixes are accepted
+  --cache-clear   - remove all cache entries before run. target may be
+                    omitted in this case
 
   valid targets:
 
      html      - (default) generates index.html with /readabale/ documentation
+                 and search-index.json for wpd_search.py next to it
+
+     html-sharded
+               - same as html, but generates directory (wayland-protocols-html
+                 by default) with page per protocol file, index.html with
+                 list of protocols, search-index.json and shared style.css
 
      yaml      - generates yaml document with yaml representation
                  of all found .xml protocols
 
+     yaml-documents
+               - same as yaml, but as yaml stream (wayland-protocols.docs.yaml
+                 by default) with document per protocol file, which can be
+                 loaded one by one with yaml.load_all()
+
      json      - same as yaml, but generates json
 
+     sqlite    - sqlite database (wayland-protocols.sqlite by default) with
+                 table per object kind, indexes and fts5 table 'search' over
+                 names, summaries and descriptions. see SQLITE_SCHEMA
+
+     binary    - same data, as json, in compact binary file
+                 (wayland-protocols.bin by default) with string table and
+                 fixed size records. wpd_binary.py loads it lazily. layout is
+                 described there at BINARY_MAGIC
+
      c++       - generates C++ .hpp include file
                  to be included in waylandcc project
                  (see https://github.com/AnimusPEXUS/waylandcc).
-""".format(cmd=sys.argv[0]))
+
+     serve     - serves same files, as html-sharded generates, over http.
+                 pages are rendered on first request and cached. .xml files
+                 are watched for changes, as with --watch
+""".format(
+        cmd=sys.argv[0],
+        skip_dirs=', '.join(SKIP_DIRS),
+        formats=', '.join(COMPRESS_FORMATS),
+        levels=', '.join(
+            '{} for {}'.format(v, k)
+            for k, v in COMPRESS_DEFAULT_LEVELS.items()
+        ),
+        serve_host=SERVE_HOST,
+        serve_port=SERVE_PORT,
+        serve_cache=SERVE_CACHE_SIZE
+    ))
 
 
 def main():
@@ -1134,112 +4955,353 @@ def main():
     if argv[0] == '-c':
         raise RuntimeError("this must be run as script")
 
-    opts, args = getopt.getopt(argv[1:], 'o:h', ['help'])
+    opts, args = getopt.getopt(
+        argv[1:],
+        'o:j:h',
+        [
+            'help', 'stream', 'include=', 'exclude=', 'order-config=',
+            'cache-dir=', 'cache-max-size=', 'cache-clear', 'compress=',
+            'compress-level=', 'watch', 'watch-poll=', 'host=', 'port=',
+            'serve-cache=', 'profile=', 'profile-memory', 'profile-cprofile=',
+            'parallel=', 'fast-yaml'
+        ]
+    )
 
     output = ''
+    jobs = 1
+    stream = False
+    include = []
+    exclude = []
+    order_config = ''
+    cache_dir = ''
+    cache_max_size = 0
+    cache_clear = False
+    compress = []
+    compress_level = None
+    watch = False
+    watch_poll = None
+    host = SERVE_HOST
+    port = SERVE_PORT
+    serve_cache = SERVE_CACHE_SIZE
+    profile = ''
+    profile_memory = False
+    profile_cprofile = ''
+    parallel = None
+    fast_yaml = False
     for i in opts:
-        if i[0] == '-o:':
+        if i[0] == '-o':
             output = i[1]
+        if i[0] == '-j':
+            try:
+                jobs = int(i[1])
+            except ValueError:
+                jobs = 0
+            if jobs < 1:
+                raise RuntimeError("-j value must be positive integer")
+        if i[0] == '--stream':
+            stream = True
+        if i[0] == '--include':
+            include.append(i[1])
+        if i[0] == '--exclude':
+            exclude.append(i[1])
+        if i[0] == '--order-config':
+            order_config = i[1]
+        if i[0] == '--cache-dir':
+            cache_dir = i[1]
+        if i[0] == '--cache-max-size':
+            cache_max_size = parse_size(i[1])
+        if i[0] == '--cache-clear':
+            cache_clear = True
+        if i[0] == '--compress':
+            compress = parse_compress_formats(i[1])
+        if i[0] == '--compress-level':
+            try:
+                compress_level = int(i[1])
+            except ValueError:
+                compress_level = -1
+            if compress_level < 0 or compress_level > 9:
+                raise RuntimeError("--compress-level value must be 0-9")
+        if i[0] == '--watch':
+            watch = True
+        if i[0] == '--watch-poll':
+            watch = True
+            try:
+                watch_poll = float(i[1])
+            except ValueError:
+                watch_poll = 0
+            if watch_poll <= 0:
+                raise RuntimeError("--watch-poll value must be positive")
+        if i[0] == '--host':
+            host = i[1]
+        if i[0] == '--port':
+            try:
+                port = int(i[1])
+            except ValueError:
+                port = -1
+            if port < 0 or port > 65535:
+                raise RuntimeError("--port value must be 0-65535")
+        if i[0] == '--serve-cache':
+            try:
+                serve_cache = int(i[1])
+            except ValueError:
+                serve_cache = 0
+            if serve_cache < 1:
+                raise RuntimeError(
+                    "--serve-cache value must be positive integer")
+        if i[0] == '--profile':
+            profile = i[1]
+        if i[0] == '--profile-memory':
+            profile_memory = True
+        if i[0] == '--profile-cprofile':
+            profile_cprofile = i[1]
+        if i[0] == '--fast-yaml':
+            fast_yaml = True
+        if i[0] == '--parallel':
+            parallel = i[1]
+            if parallel not in ['threads', 'processes']:
+                raise RuntimeError(
+                    "--parallel value must be threads or processes")
         if i[0] in ['-h', '--help']:
             print_help()
             return
 
-    target = args[0]
-
-    acceptable_targets = ['html', 'yaml', 'json', 'c++']
-
-    if not target in acceptable_targets:
-        raise RuntimeError(
-            "invalid target. valid are {}".format(acceptable_targets))
-
-    if output == '':
-        if target == 'html':
-            output = 'index.html'
+    if order_config != '':
+        load_order_config(order_config)
+
+    cache = None
+    if cache_dir != '':
+        cache = ProtocolFileCache(cache_dir, cache_max_size)
+        if cache_clear:
+            print("clearing cache {}".format(cache.directory))
+            cache.clear()
+    elif cache_clear or cache_max_size != 0:
+        raise RuntimeError("cache options require --cache-dir")
+
+    if profile_memory and profile == '':
+        raise RuntimeError("--profile-memory requires --profile")
+
+    if cache_clear and len(args) == 0:
+        return
+
+    if len(args) == 0:
+        raise RuntimeError("target required")
+
+    acceptable_targets = [
+        'html', 'html-sharded', 'yaml', 'yaml-documents', 'json', 'binary',
+        'sqlite', 'c++', 'serve'
+    ]
+
+    targets = []
+    for target in args:
+        if not target in acceptable_targets:
+            raise RuntimeError(
+                "invalid target. valid are {}".format(acceptable_targets))
+        if target not in targets:
+            targets.append(target)
+
+    if 'serve' in targets and len(targets) != 1:
+        raise RuntimeError("serve target can't be combined with others")
+
+    if output != '' and len(targets) != 1:
+        raise RuntimeError("-o can be used only with single target")
+
+    if parallel is not None and watch and parallel != 'threads':
+        raise RuntimeError("--watch can be used only with --parallel threads")
+
+    outputs = dict()
+    for target in targets:
+        if output != '':
+            outputs[target] = output
+        elif target == 'html':
+            outputs[target] = 'index.html'
+        elif target == 'html-sharded':
+            outputs[target] = 'wayland-protocols-html'
         elif target == 'yaml':
-            output = 'wayland-protocols.yaml'
+            outputs[target] = 'wayland-protocols.yaml'
+        elif target == 'yaml-documents':
+            outputs[target] = 'wayland-protocols.docs.yaml'
         elif target == 'json':
-            output = 'wayland-protocols.json'
+            outputs[target] = 'wayland-protocols.json'
+        elif target == 'binary':
+            outputs[target] = 'wayland-protocols.bin'
+        elif target == 'sqlite':
+            outputs[target] = 'wayland-protocols.sqlite'
         elif target == 'c++':
-            output = 'wayland_protocol_generated.hpp'
+            outputs[target] = 'wayland_protocol_generated.hpp'
+        elif target == 'serve':
+            outputs[target] = ''
         else:
             raise RuntimeError("invalid target")
 
-    print(f"target is {target}. output file is {output}")
+    stdout = None
+    if output == '-':
+        target = targets[0]
+        if target == 'html-sharded':
+            raise RuntimeError("html-sharded can't be written to stdout")
+        if len(compress) != 0:
+            raise RuntimeError("--compress can't be used with stdout output")
+        if watch:
+            raise RuntimeError("--watch can't be used with stdout output")
+        # stdout is taken by output, so progress messages go to stderr
+        stdout = sys.stdout.buffer
+        sys.stdout = sys.stderr
+
+    for target in targets:
+        if target == 'serve':
+            print(f"target is {target}")
+        else:
+            print(f"target is {target}. output file is {outputs[target]}")
 
-    if len(args) != 1:
-        raise RuntimeError("invalid arg count")
+    if fast_yaml and set_yaml_dumper(True) is not yaml.Dumper:
+        print("using libyaml emitter for yaml")
 
     cwd = os.path.dirname(os.path.abspath(argv[0]))
 
-    xml_files = find_all_xml_files(cwd)
-
-    print("found {} xml files".format(len(xml_files)))
-
-    print("parsing xml..")
-    parsed_docs = dict()
-    for i in xml_files:
-        print(f"  {i}: ", end='')
-        i = os.path.join(cwd, i)
-        k, v = parse_xml(i)
-        if k is None or v is None:
-            print("  fail")
-            continue
-
-        k_spl = k.split('/')
-        if 'tests' in k_spl:
-            print("  fail")
-            continue
-
-        print("  ok")
-        parsed_docs[k] = v
-
-    print("parsing result: {} protocol files".format(len(parsed_docs)))
+    profiler = None
+    if profile != '':
+        profiler = Profiler(profile_memory)
+        set_active_profiler(profiler)
 
-    print("generating tree..")
-    obj_tree = generate_ProtocolCollection(parsed_docs)
+    c_profile = None
+    if profile_cprofile != '':
+        c_profile = cProfile.Profile()
+        c_profile.enable()
 
-    print("sorting..")
-    obj_tree.sort_protocol_files()
-
-    del parsed_docs
-
-    if target == 'html':
-        print("generating html")
-
-        txt = generate_html(obj_tree)
-
-        with open(output, 'wb') as f:
-            f.write(txt)
+    scan_stats = dict()
+    with profile_stage(profiler, 'scan'):
+        xml_files = find_all_xml_files(cwd, include, exclude, scan_stats)
 
-    elif target == 'yaml':
-        print("generating yaml")
-
-        struct = generate_simple_struct(obj_tree)
-
-        txt = generate_yaml(struct)
-
-        with open(output, 'w') as f:
-            f.write(txt)
+    print(
+        "found {} xml files in {:.3f}s ({} dirs scanned, {} skipped)".format(
+            len(xml_files),
+            scan_stats['scan_time'],
+            scan_stats['dirs_scanned'],
+            scan_stats['dirs_skipped'],
+        )
+    )
 
-    elif target == 'json':
-        print("generating json")
+    if jobs > 1:
+        print("parsing xml and generating tree using {} processes..".format(
+            jobs))
+    else:
+        print("parsing xml and generating tree..")
+
+    load_stats = dict()
+    with profile_stage(profiler, 'load'):
+        obj_tree = generate_ProtocolCollection_for_files(
+            cwd,
+            xml_files,
+            jobs,
+            cache,
+            load_stats,
+            profiler
+        )
 
-        struct = generate_simple_struct(obj_tree)
+    print("parsing result: {} protocol files".format(
+        len(obj_tree.protocol_files)))
 
-        txt = generate_json(struct)
+    # sniffing costs time for every file, accepted ones too. parsing time
+    # avoided for rejected files is estimated from parsing speed of the
+    # parsed files. both are shown, as they are measured differently
 
-        with open(output, 'w') as f:
-            f.write(txt)
+    avoided = 0.0
+    if load_stats['parsed_bytes'] != 0:
+        avoided = (
+            load_stats['rejected_bytes']
+            * load_stats['parse_time']
+            / load_stats['parsed_bytes']
+        )
 
-    elif target == 'c++':
-        print(f"generating c++ header file")
-        txt = generate_cpp_code(obj_tree)
+    print(
+        "sniffed root element of {} files in {:.3f}s, rejected {}"
+        " non-protocol files ({} bytes), about {:.3f}s of parsing"
+        " avoided".format(
+            load_stats['parsed'] + load_stats['rejected'],
+            load_stats['sniff_time'],
+            load_stats['rejected'],
+            load_stats['rejected_bytes'],
+            avoided
+        )
+    )
 
-        with open(output, 'w') as f:
-            f.write(txt)
+    if cache is not None:
+        cache.prune()
+        print(cache.stats_txt())
 
-    else:
-        raise RuntimeError("invalid target")
+    print("sorting..")
+    with profile_stage(profiler, 'sort'):
+        obj_tree.sort_protocol_files()
+
+    with profile_stage(profiler, 'index'):
+        index = obj_tree.build_index()
+    print("indexed {} protocols, {} interfaces".format(
+        len(index.protocols), len(index.interfaces)))
+
+    with profile_stage(profiler, 'xref'):
+        xref = obj_tree.get_xref()
+    print("cross-referenced {} interfaces".format(len(xref.references)))
+
+    if targets == ['serve']:
+        finish_profiling(profiler, profile, c_profile, profile_cprofile)
+        serve(
+            cwd,
+            obj_tree,
+            xml_files,
+            host,
+            port,
+            include,
+            exclude,
+            cache,
+            watch_poll,
+            serve_cache,
+            compress_level
+        )
+        print("exit ok")
+        return
+
+    fragments = None
+    if watch:
+        fragments = dict()
+        for target in targets:
+            if target in FRAGMENT_TARGETS:
+                fragments[target] = OutputFragments()
+
+    def write():
+        write_targets(
+            obj_tree,
+            targets,
+            outputs,
+            stream,
+            compress,
+            compress_level,
+            stdout,
+            fragments,
+            parallel
+        )
+        if watch:
+            for target, target_fragments in fragments.items():
+                print("{}: {} protocol file parts generated, {} reused".format(
+                    target,
+                    target_fragments.generated,
+                    target_fragments.reused
+                ))
+
+    with profile_stage(profiler, 'emit'):
+        write()
+
+    finish_profiling(profiler, profile, c_profile, profile_cprofile)
+
+    if watch:
+        watch_files(
+            cwd,
+            obj_tree,
+            xml_files,
+            write,
+            include,
+            exclude,
+            cache,
+            watch_poll
+        )
 
     print("exit ok")
 
@@ -0,0 +1,501 @@
+import bisect
+import collections
+import getopt
+import json
+import mmap
+import struct
+import sys
+
+
+# loads wayland-protocols.bin, written by wpd.py binary target. file is
+# memory-mapped: records are read when they are accessed and strings are
+# decoded on access, so opening file costs the same for any corpus size
+
+# binary target layout. all numbers are little-endian uint32, except magic.
+#
+#   header  - BINARY_MAGIC, BINARY_VERSION, then (offset, count) of each
+#             section in BINARY_SECTIONS order. offsets are from start of
+#             file
+#   strings - count + 1 offsets in string data. string N is
+#             string_data[offsets[N]:offsets[N + 1]] in utf-8. string 0 is
+#             empty one. each string is stored once
+#   string_data
+#           - count is size in bytes
+#   records - sections from BINARY_RECORDS: count fixed size records with
+#             fields listed there. fields without 'first_' prefix and not
+#             named as child section are string numbers. children of record
+#             are stored one after another: 'first_x' is number of the first
+#             one in section x and field 'x' is their count. requests and
+#             events of interface are both in messages section, requests
+#             first
+#   interface_names
+#           - count numbers of interfaces, sorted by name
+#
+# wpd.py writes it with BinaryWriter. BINARY_VERSION must change with any
+# layout change
+
+BINARY_MAGIC = b'WPDBIN\r\n'
+BINARY_VERSION = 1
+
+BINARY_RECORDS = collections.OrderedDict([
+    ('protocol_files', ['basename', 'dirname', 'first_protocol', 'protocols']),
+    ('protocols', [
+        'name', 'first_description', 'descriptions',
+        'first_interface', 'interfaces'
+    ]),
+    ('interfaces', [
+        'name', 'version', 'first_description', 'descriptions',
+        'first_message', 'requests', 'events', 'first_enum', 'enums'
+    ]),
+    ('messages', [
+        'name', 'first_description', 'descriptions', 'first_arg', 'args'
+    ]),
+    ('args', ['name', 'type', 'interface', 'enum', 'summary']),
+    ('enums', [
+        'name', 'first_description', 'descriptions', 'first_entry', 'entries'
+    ]),
+    ('entries', ['name', 'value', 'summary']),
+    ('descriptions', ['summary', 'text']),
+])
+
+BINARY_SECTIONS = (
+    ['strings', 'string_data'] + list(BINARY_RECORDS) + ['interface_names']
+)
+
+BINARY_HEADER = struct.Struct('<8sI' + 'II' * len(BINARY_SECTIONS))
+
+UINT32 = struct.Struct('<I')
+
+
+class RecordList:
+
+    # lazy sequence of count records of section, starting from first
+
+    __slots__ = ('model', 'cls', 'first', 'count')
+
+    def __init__(self, model, cls, first, count):
+        self.model = model
+        self.cls = cls
+        self.first = first
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self.count))]
+        if i < 0:
+            i += self.count
+        if i < 0 or i >= self.count:
+            raise IndexError("record index out of range")
+        return self.cls(self.model, self.first + i)
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self.cls(self.model, self.first + i)
+
+
+class Record:
+
+    # numbers of record are read, when it's made. strings are decoded on
+    # each access. subclasses set section and define properties for fields
+    # they expose
+
+    __slots__ = ('model', 'index', 'fields')
+
+    section = None
+
+    def __init__(self, model, index):
+        self.model = model
+        self.index = index
+        self.fields = model.record(self.section, index)
+
+    def field(self, name):
+        return self.fields[self.model.field_index[self.section][name]]
+
+    def string(self, name):
+        return self.model.string(self.field(name))
+
+    def children(self, cls, first, count):
+        return RecordList(
+            self.model,
+            cls,
+            self.field(first),
+            self.field(count)
+        )
+
+    def __repr__(self):
+        return '<{} {}>'.format(type(self).__name__, self.index)
+
+
+class Description(Record):
+
+    __slots__ = ()
+
+    section = 'descriptions'
+
+    @property
+    def summary(self):
+        return self.string('summary')
+
+    @property
+    def text(self):
+        return self.string('text')
+
+    def simple_struct(self):
+        return [self.summary, self.text]
+
+
+class NamedRecord(Record):
+
+    __slots__ = ()
+
+    @property
+    def name(self):
+        return self.string('name')
+
+    @property
+    def descriptions(self):
+        return self.children(Description, 'first_description', 'descriptions')
+
+    def common_simple_struct(self):
+        return [
+            ['name', self.name],
+            ['descriptions', [i.simple_struct() for i in self.descriptions]],
+        ]
+
+
+class Argument(Record):
+
+    __slots__ = ()
+
+    section = 'args'
+
+    @property
+    def name(self):
+        return self.string('name')
+
+    @property
+    def type(self):
+        return self.string('type')
+
+    @property
+    def interface(self):
+        return self.string('interface')
+
+    @property
+    def enum(self):
+        return self.string('enum')
+
+    @property
+    def summary(self):
+        return self.string('summary')
+
+    def simple_struct(self):
+        return [
+            ['name', self.name],
+            ['type', self.type],
+            ['interface', self.interface],
+            ['summary', self.summary],
+        ]
+
+
+class Message(NamedRecord):
+
+    __slots__ = ()
+
+    section = 'messages'
+
+    @property
+    def args(self):
+        return self.children(Argument, 'first_arg', 'args')
+
+    def simple_struct(self):
+        return self.common_simple_struct() + [
+            ['args', [i.simple_struct() for i in self.args]],
+        ]
+
+
+class Entry(Record):
+
+    __slots__ = ()
+
+    section = 'entries'
+
+    @property
+    def name(self):
+        return self.string('name')
+
+    @property
+    def value(self):
+        return self.string('value')
+
+    @property
+    def summary(self):
+        return self.string('summary')
+
+    def simple_struct(self):
+        return [
+            ['name', self.name],
+            ['value', self.value],
+            ['summary', self.summary],
+        ]
+
+
+class Enum(NamedRecord):
+
+    __slots__ = ()
+
+    section = 'enums'
+
+    @property
+    def entries(self):
+        return self.children(Entry, 'first_entry', 'entries')
+
+    def simple_struct(self):
+        return self.common_simple_struct() + [
+            ['entries', [i.simple_struct() for i in self.entries]],
+        ]
+
+
+class Interface(NamedRecord):
+
+    __slots__ = ()
+
+    section = 'interfaces'
+
+    @property
+    def version(self):
+        return self.string('version')
+
+    @property
+    def requests(self):
+        return RecordList(
+            self.model,
+            Message,
+            self.field('first_message'),
+            self.field('requests')
+        )
+
+    @property
+    def events(self):
+        return RecordList(
+            self.model,
+            Message,
+            self.field('first_message') + self.field('requests'),
+            self.field('events')
+        )
+
+    @property
+    def enums(self):
+        return self.children(Enum, 'first_enum', 'enums')
+
+    def simple_struct(self):
+        return self.common_simple_struct() + [
+            ['version', self.version],
+            ['requests', [i.simple_struct() for i in self.requests]],
+            ['events', [i.simple_struct() for i in self.events]],
+            ['enums', [i.simple_struct() for i in self.enums]],
+        ]
+
+
+class Protocol(NamedRecord):
+
+    __slots__ = ()
+
+    section = 'protocols'
+
+    @property
+    def interfaces(self):
+        return self.children(Interface, 'first_interface', 'interfaces')
+
+    def simple_struct(self):
+        return self.common_simple_struct() + [
+            ['interfaces', [i.simple_struct() for i in self.interfaces]],
+        ]
+
+
+class ProtocolFile(Record):
+
+    __slots__ = ()
+
+    section = 'protocol_files'
+
+    @property
+    def basename(self):
+        return self.string('basename')
+
+    @property
+    def dirname(self):
+        return self.string('dirname')
+
+    @property
+    def protocols(self):
+        return self.children(Protocol, 'first_protocol', 'protocols')
+
+    def simple_struct(self):
+        return [
+            ['basename', self.basename],
+            ['dirname', self.dirname],
+            ['protocols', [i.simple_struct() for i in self.protocols]],
+        ]
+
+
+class BinaryModel:
+
+    # data - bytes-like object with whole file (bytes, mmap). nothing is
+    # copied from it until records are accessed
+
+    def __init__(self, data):
+
+        if len(data) < BINARY_HEADER.size:
+            raise RuntimeError("file is too short for wpd binary")
+
+        header = BINARY_HEADER.unpack_from(data, 0)
+        if header[0] != BINARY_MAGIC:
+            raise RuntimeError("not a wpd binary file")
+        if header[1] != BINARY_VERSION:
+            raise RuntimeError(
+                "unsupported wpd binary version: {}".format(header[1]))
+
+        self.data = data
+        self.view = memoryview(data)
+
+        self.offsets = dict()
+        self.counts = dict()
+        for i, name in enumerate(BINARY_SECTIONS):
+            self.offsets[name] = header[2 + i * 2]
+            self.counts[name] = header[3 + i * 2]
+
+        self.record_structs = dict()
+        self.field_index = dict()
+        for name, fields in BINARY_RECORDS.items():
+            self.record_structs[name] = struct.Struct('<' + 'I' * len(fields))
+            self.field_index[name] = dict(
+                (field, i) for i, field in enumerate(fields))
+
+        self.protocol_files = RecordList(
+            self,
+            ProtocolFile,
+            0,
+            self.counts['protocol_files']
+        )
+
+    def close(self):
+        self.view.release()
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def record(self, section, index):
+        if index >= self.counts[section]:
+            raise IndexError("{} record index out of range".format(section))
+        s = self.record_structs[section]
+        return s.unpack_from(self.data, self.offsets[section] + index * s.size)
+
+    def uint32(self, section, index):
+        return UINT32.unpack_from(
+            self.data, self.offsets[section] + index * 4)[0]
+
+    def string(self, index):
+        start, end = struct.unpack_from(
+            '<II', self.data, self.offsets['strings'] + index * 4)
+        offset = self.offsets['string_data']
+        return str(self.view[offset + start:offset + end], 'utf-8')
+
+    def interface(self, index):
+        return Interface(self, index)
+
+    def find_interface(self, name):
+
+        # binary search over interface_names. returns first interface with
+        # given name or None
+
+        names = self.counts['interface_names']
+
+        lo = bisect.bisect_left(
+            range(names),
+            name,
+            key=lambda i: Interface(
+                self, self.uint32('interface_names', i)).name
+        )
+
+        if lo == names:
+            return None
+
+        ret = Interface(self, self.uint32('interface_names', lo))
+        if ret.name != name:
+            return None
+        return ret
+
+    def interfaces(self):
+        return RecordList(self, Interface, 0, self.counts['interfaces'])
+
+    def simple_struct(self):
+        # same struct, as wpd.py generate_simple_struct() makes
+        return [
+            ['protocol_file', i.simple_struct()] for i in self.protocol_files
+        ]
+
+
+def load_binary(filename):
+    with open(filename, 'rb') as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return BinaryModel(data)
+
+
+def print_help():
+    print(
+        """
+{cmd} [options] [interface ...]
+
+  prints interfaces with given names from wpd.py binary output, or counts
+  of records, if no names are given
+
+  -i  filename    - binary file. default is wayland-protocols.bin
+  --json          - print whole model as json, same as wpd.py json target
+""".format(cmd=sys.argv[0]))
+
+
+def main():
+
+    opts, args = getopt.getopt(sys.argv[1:], 'i:h', ['help', 'json'])
+
+    filename = 'wayland-protocols.bin'
+    as_json = False
+    for i in opts:
+        if i[0] == '-i':
+            filename = i[1]
+        if i[0] == '--json':
+            as_json = True
+        if i[0] in ['-h', '--help']:
+            print_help()
+            return
+
+    with load_binary(filename) as model:
+
+        if as_json:
+            sys.stdout.write(json.dumps(model.simple_struct(), indent=4))
+            return
+
+        if len(args) == 0:
+            for name in BINARY_SECTIONS:
+                print("{:16} {}".format(name, model.counts[name]))
+            return
+
+        for name in args:
+            interface = model.find_interface(name)
+            if interface is None:
+                print("{}: not found".format(name))
+                continue
+            print(json.dumps(interface.simple_struct(), indent=4))
+
+
+if __name__ == '__main__':
+    main()
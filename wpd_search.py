@@ -0,0 +1,263 @@
+import bisect
+import getopt
+import itertools
+import json
+import re
+import sys
+
+
+# queries search-index.json, written by wpd.py html and html-sharded targets
+
+# search index format version. wpd.py writes it, SearchIndex checks it
+SEARCH_INDEX_VERSION = 2
+
+# kinds of documents. index stores their numbers in this list
+SEARCH_KINDS = [
+    'protocol', 'interface', 'request', 'event', 'enum', 'arg', 'entry'
+]
+
+# parts of html anchors of messages and enums, as wpd.py makes them:
+# <protocol>-<interface>-<part>-<name>
+SEARCH_ANCHOR_PARTS = {'request': 'req', 'event': 'eve', 'enum': 'enu'}
+
+# tokens shorter than 2 chars and these words are not indexed. wpd.py uses
+# search_tokens() for the index, so documents and queries are split the same
+SEARCH_TOKEN_RE = re.compile('[a-z0-9]+')
+SEARCH_STOP_WORDS = set([
+    'a', 'an', 'and', 'are', 'as', 'be', 'by', 'for', 'if', 'in', 'is',
+    'it', 'of', 'on', 'or', 'that', 'the', 'this', 'to', 'with',
+])
+
+
+def search_tokens(txt):
+    ret = []
+    for i in SEARCH_TOKEN_RE.findall(txt.lower()):
+        if len(i) > 1 and i not in SEARCH_STOP_WORDS:
+            ret.append(i)
+    return ret
+
+
+def delta_encode(docs):
+    # sorted doc numbers -> first number and differences to previous ones
+    ret = []
+    prev = 0
+    for i in docs:
+        ret.append(i - prev)
+        prev = i
+    return ret
+
+
+def delta_decode(deltas):
+    return list(itertools.accumulate(deltas))
+
+
+# name matches weigh more than description matches
+NAME_SCORE = 10
+TEXT_SCORE = 1
+
+
+class SearchIndex:
+
+    # index keeps for each doc only [kind number, own name, parent]: parent
+    # is number of parent doc, or number of page in 'pages' for protocols.
+    # qualified names and hrefs are made from parents on demand. names and
+    # text - token -> delta-encoded doc numbers. whole qualified names and
+    # their dot-separated parts are matched too, but they are not stored:
+    # they are collected from docs on first search
+
+    def __init__(self, struct):
+        if struct.get('version') != SEARCH_INDEX_VERSION:
+            raise RuntimeError(
+                "unsupported search index version: {}".format(
+                    struct.get('version')))
+        self.kinds = struct['kinds']
+        self.pages = struct['pages']
+        self.docs = struct['docs']
+        self.names = struct['names']
+        self.text = struct['text']
+        self._resolved = [None] * len(self.docs)
+        self._exact = None
+        self._exact_sorted = None
+        self._names_sorted = None
+        self._text_sorted = None
+
+    def doc(self, doc):
+
+        # returns [kind, qualified name, href]
+
+        ret = self._resolved[doc]
+        if ret is not None:
+            return ret
+
+        kind, name, parent = self.docs[doc]
+        kind = self.kinds[kind]
+
+        if kind == 'protocol':
+            ret = [kind, name, self.pages[parent] + '#' + name]
+        else:
+            parent_name, parent_href = self.doc(parent)[1:]
+            if kind == 'interface':
+                ret = [kind, name, parent_href + '-' + name]
+            elif kind in ['arg', 'entry']:
+                ret = [kind, parent_name + '.' + name, parent_href]
+            else:
+                ret = [
+                    kind,
+                    parent_name + '.' + name,
+                    '{}-{}-{}'.format(
+                        parent_href, SEARCH_ANCHOR_PARTS[kind], name)
+                ]
+
+        self._resolved[doc] = ret
+        return ret
+
+    def _exact_names(self):
+        if self._exact is None:
+            self._exact = dict()
+            for doc in range(len(self.docs)):
+                n = self.doc(doc)[1].lower()
+                for i in [n] + n.split('.'):
+                    lst = self._exact.setdefault(i, [])
+                    if len(lst) == 0 or lst[-1] != doc:
+                        lst.append(doc)
+            self._exact_sorted = sorted(self._exact)
+        return self._exact
+
+    def _prefixed(self, dct, sorted_keys, prefix):
+        ret = []
+        i = bisect.bisect_left(sorted_keys, prefix)
+        while i < len(sorted_keys) and sorted_keys[i].startswith(prefix):
+            ret.append(dct[sorted_keys[i]])
+            i += 1
+        return ret
+
+    def _lookup(self, term, prefix):
+
+        # returns (name doc lists, text doc lists) for the term
+
+        exact = self._exact_names()
+
+        if not prefix:
+            return (
+                [
+                    delta_decode(self.names.get(term, [])),
+                    exact.get(term, [])
+                ],
+                [delta_decode(self.text.get(term, []))]
+            )
+
+        if self._names_sorted is None:
+            self._names_sorted = sorted(self.names)
+            self._text_sorted = sorted(self.text)
+
+        name_lists = []
+        for i in self._prefixed(self.names, self._names_sorted, term):
+            name_lists.append(delta_decode(i))
+        name_lists += self._prefixed(exact, self._exact_sorted, term)
+
+        text_lists = []
+        for i in self._prefixed(self.text, self._text_sorted, term):
+            text_lists.append(delta_decode(i))
+
+        return name_lists, text_lists
+
+    def search(self, query, limit=20, prefix=True):
+
+        # all query words must match (in name or in description). returns
+        # list of (score, [kind, name, href]) with best matches first
+
+        terms = []
+        for i in query.lower().split():
+            if i in self.names or i in self._exact_names():
+                terms.append(i)
+                continue
+            terms += search_tokens(i)
+
+        if len(terms) == 0:
+            return []
+
+        scores = None
+
+        for term in terms:
+            term_scores = dict()
+            name_lists, text_lists = self._lookup(term, prefix)
+            for lst in text_lists:
+                for doc in lst:
+                    term_scores[doc] = TEXT_SCORE
+            for lst in name_lists:
+                for doc in lst:
+                    term_scores[doc] = NAME_SCORE
+
+            if scores is None:
+                scores = term_scores
+            else:
+                new_scores = dict()
+                for doc in scores:
+                    if doc in term_scores:
+                        new_scores[doc] = scores[doc] + term_scores[doc]
+                scores = new_scores
+
+            if len(scores) == 0:
+                break
+
+        ret = sorted(
+            scores.items(),
+            key=lambda x: (-x[1], len(self.doc(x[0])[1]), x[0])
+        )
+
+        return [(score, self.doc(doc)) for doc, score in ret[:limit]]
+
+
+def load_search_index(filename):
+    with open(filename) as f:
+        return SearchIndex(json.load(f))
+
+
+def print_help():
+    print(
+        """
+{cmd} [options] query words
+
+  searches protocols, interfaces, requests, events, enums, entries and
+  arguments by names and description words. all words must match. words
+  match as prefixes, unless -x is given
+
+  -i  filename    - search index. default is search-index.json
+  -n  N           - show at most N results. default is 20
+  -x              - match whole words only
+""".format(cmd=sys.argv[0]))
+
+
+def main():
+
+    opts, args = getopt.getopt(sys.argv[1:], 'i:n:xh', ['help'])
+
+    index_filename = 'search-index.json'
+    limit = 20
+    prefix = True
+    for i in opts:
+        if i[0] == '-i':
+            index_filename = i[1]
+        if i[0] == '-n':
+            limit = int(i[1])
+        if i[0] == '-x':
+            prefix = False
+        if i[0] in ['-h', '--help']:
+            print_help()
+            return
+
+    if len(args) == 0:
+        raise RuntimeError("query required")
+
+    index = load_search_index(index_filename)
+
+    for score, (kind, name, href) in index.search(
+            ' '.join(args),
+            limit,
+            prefix
+    ):
+        print("{:<9} {:<50} {}".format(kind, name, href))
+
+
+if __name__ == '__main__':
+    main()